@@ -0,0 +1,118 @@
+import sys
+import time
+
+import numpy as np
+
+from engine import SUM_TARGET, TOTAL_PAIRS_PER_LEVEL
+
+# Vectorized board statistics for difficulty tuning.
+# Boards are an (N, rows, cols) integer array of numbers 1-9, with an
+# optional boolean visibility mask of the same shape. Everything is computed
+# with whole-array operations; the only Python loop is over memory chunks.
+
+NUM_VALUES = 10  # numbers are 1-9, index 0 unused
+CHUNK_SIZE = 65536
+
+def board_counts(boards, visible=None):
+    """Per-board histogram of visible numbers, shape (N, 10)"""
+    boards = np.asarray(boards)
+    n = boards.shape[0]
+    cells = boards.shape[1] * boards.shape[2]
+    flat = boards.reshape(n, cells).astype(np.int64)
+    # Offset every board into its own block of 10 bins, then one bincount
+    flat = flat + (np.arange(n, dtype=np.int64) * NUM_VALUES)[:, None]
+    if visible is not None:
+        flat = flat[np.asarray(visible).reshape(n, cells)]
+    counts = np.bincount(flat.ravel(), minlength=n * NUM_VALUES)
+    return counts.reshape(n, NUM_VALUES)
+
+def _complement_columns(target):
+    # Number pairs (a, b) with a + b == target and a <= b
+    a = np.arange(1, NUM_VALUES)
+    b = target - a
+    keep = (b >= a) & (b <= 9)
+    return a[keep], b[keep]
+
+def count_identical_pairs(counts):
+    return (counts * (counts - 1) // 2).sum(axis=1)
+
+def count_sum_pairs(counts, target=SUM_TARGET):
+    a, b = _complement_columns(target)
+    same = a == b
+    cross = (counts[:, a[~same]] * counts[:, b[~same]]).sum(axis=1)
+    self_pairs = (counts[:, a[same]] * (counts[:, a[same]] - 1) // 2).sum(axis=1)
+    return cross + self_pairs
+
+def max_sum_matching(counts, target=SUM_TARGET):
+    """Most disjoint sum-to-target pairs that can still be removed"""
+    a, b = _complement_columns(target)
+    same = a == b
+    cross = np.minimum(counts[:, a[~same]], counts[:, b[~same]]).sum(axis=1)
+    self_pairs = (counts[:, a[same]] // 2).sum(axis=1)
+    return cross + self_pairs
+
+def _analyze_chunk(boards, visible, target, pairs_needed):
+    counts = board_counts(boards, visible)
+    cells = boards.shape[1] * boards.shape[2]
+    pairs_found = (cells - counts.sum(axis=1)) // 2
+    sum_pairs = count_sum_pairs(counts, target)
+    max_sum = max_sum_matching(counts, target)
+    return {
+        'identical_pairs': count_identical_pairs(counts),
+        'sum_pairs': sum_pairs,
+        'can_continue_level2': sum_pairs > 0,
+        'max_sum_pairs': max_sum,
+        'level2_finishable': pairs_found + max_sum >= pairs_needed,
+    }
+
+def analyze_boards(boards, visible=None, target=SUM_TARGET,
+                   pairs_needed=TOTAL_PAIRS_PER_LEVEL, chunk_size=CHUNK_SIZE):
+    """Pair statistics for every board; counts match engine.find_*_pairs"""
+    boards = np.asarray(boards)
+    if boards.ndim != 3:
+        raise ValueError(f"expected an (N, rows, cols) array, got shape {boards.shape}")
+    if visible is not None:
+        visible = np.asarray(visible, dtype=bool)
+        if visible.shape != boards.shape:
+            raise ValueError("visibility mask must match the boards shape")
+
+    parts = []
+    for start in range(0, boards.shape[0], chunk_size):
+        stop = start + chunk_size
+        mask = None if visible is None else visible[start:stop]
+        parts.append(_analyze_chunk(boards[start:stop], mask, target, pairs_needed))
+    if not parts:
+        parts.append(_analyze_chunk(boards, visible, target, pairs_needed))
+    return {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+
+def generate_boards(n, rows, cols, seed=None, level=1):
+    """N boards drawn like engine.generate_numbers: 10 planted pairs + extras"""
+    cells = rows * cols
+    if cells < 2 * TOTAL_PAIRS_PER_LEVEL:
+        raise ValueError(f"a {rows}x{cols} grid cannot hold {TOTAL_PAIRS_PER_LEVEL} pairs")
+    rng = np.random.default_rng(seed)
+    if level == 1:
+        pairs = rng.integers(1, 10, size=(n, TOTAL_PAIRS_PER_LEVEL), dtype=np.int8)
+        partners = pairs
+    else:
+        pairs = rng.integers(1, SUM_TARGET, size=(n, TOTAL_PAIRS_PER_LEVEL), dtype=np.int8)
+        partners = SUM_TARGET - pairs
+    extras = rng.integers(1, 10, size=(n, cells - 2 * TOTAL_PAIRS_PER_LEVEL), dtype=np.int8)
+    numbers = np.concatenate([pairs, partners, extras], axis=1)
+    return rng.permuted(numbers, axis=1).reshape(n, rows, cols)
+
+def benchmark(n=1_000_000, rows=5, cols=5, seed=0, level=1):
+    boards = generate_boards(n, rows, cols, seed, level)
+    start = time.perf_counter()
+    stats = analyze_boards(boards)
+    elapsed = time.perf_counter() - start
+    return n / elapsed, stats
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    level = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    rate, stats = benchmark(n, level=level)
+    print(f"{n} level {level} boards analysed at {rate:,.0f} boards/s")
+    print(f"level 2 finishable: {stats['level2_finishable'].mean():.1%}")
+    print(f"mean identical pairs: {stats['identical_pairs'].mean():.2f}")
+    print(f"mean sum-to-7 pairs: {stats['sum_pairs'].mean():.2f}")
@@ -0,0 +1,60 @@
+import hashlib
+import os
+
+import pygame
+
+# On-disk cache of decoded assets. Backgrounds are stored already scaled to
+# the target resolution as raw RGB, sounds as raw PCM in the mixer's
+# format, so a warm launch skips JPEG/MP3 decoding and scaling entirely.
+# Entries are keyed by the source file's path, mtime and size plus the
+# target resolution (or mixer format): editing an asset or changing the
+# window size misses the cache instead of serving a stale copy.
+# Delete the directory to clear it.
+
+CACHE_DIR = os.environ.get('SPACE_MATCH_CACHE_DIR', 'cache')
+
+def cache_path(path, tag, ext):
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{tag}"
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{os.path.basename(path)}.{tag}.{digest}.{ext}")
+
+def _read(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _write(path, data):
+    # Write-then-rename, so a crash never leaves a truncated entry behind
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # the cache is only an optimisation
+
+def load_image(path, size):
+    """The image at `path` scaled to `size`, from the cache when possible"""
+    width, height = size
+    cached = cache_path(path, f"{width}x{height}", 'rgb')
+    data = _read(cached)
+    if data is not None and len(data) == width * height * 3:
+        return pygame.image.frombytes(data, size, 'RGB')
+    image = pygame.transform.scale(pygame.image.load(path), size)
+    _write(cached, pygame.image.tobytes(image, 'RGB'))
+    return image
+
+def load_sound(path):
+    """A Sound for `path`, decoded once and then loaded as raw PCM"""
+    frequency, fmt, channels = pygame.mixer.get_init()
+    cached = cache_path(path, f"{frequency}-{fmt}-{channels}", 'pcm')
+    data = _read(cached)
+    if data:
+        return pygame.mixer.Sound(buffer=data)
+    sound = pygame.mixer.Sound(path)
+    _write(cached, sound.get_raw())
+    return sound
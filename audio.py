@@ -0,0 +1,243 @@
+import array
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import pygame
+
+import assetcache
+
+# Sound effects and music. Effects are decoded (or synthesized) to PCM once
+# and kept in a size-capped LRU cache, then played on a fixed pool of
+# reserved channels, so a click never waits on a decoder or on finding a
+# free channel. Music keeps streaming through mixer.music the whole time:
+# between screens it is faded down under a jingle and back up again
+# instead of being stopped and restarted.
+#
+# Latency: a triggered sound starts mixing on the mixer's next callback, so
+# it reaches the output within about two buffers (the one being played
+# plus the one being filled). At AUDIO_BUFFER = 256 frames and 44.1 kHz
+# that is 11.6 ms, inside one 60 FPS frame; pygame's default 512 is not.
+
+AUDIO_FREQUENCY = 44100
+AUDIO_BUFFER = int(os.environ.get('SPACE_MATCH_AUDIO_BUFFER', 256))  # frames per mixer callback
+SFX_CHANNELS = 4  # channels reserved for effects
+SFX_CACHE_BYTES = int(os.environ.get('SPACE_MATCH_SFX_CACHE_BYTES', 4 * 1024 * 1024))
+MUSIC_FILE = "music.mp3"
+MUSIC_VOLUME = 0.2
+DUCK_VOLUME = 0.03  # music under a jingle
+FADE_TIME = 0.6     # seconds
+FADE_STEP_MS = 20
+LATENCY_SAMPLES = 256
+
+# An effect is read from its file when there is one, otherwise synthesized
+# from its notes: (pitch in Hz, seconds), played one after another.
+EFFECT_FILES = {
+    'select': "select.wav",
+    'valid': "valid.wav",
+    'invalid': "invalid.wav",
+    'complete': "complete.wav",
+    'game_over': "game_over.mp3",
+}
+EFFECT_NOTES = {
+    'select': [(880, 0.03)],
+    'valid': [(660, 0.06), (990, 0.09)],
+    'invalid': [(220, 0.08), (185, 0.12)],
+    'complete': [(523, 0.09), (659, 0.09), (784, 0.09), (1047, 0.25)],
+}
+TONE_VOLUME = 0.3
+TONE_RAMP = 0.005  # seconds of fade in/out per note, so notes don't click
+
+AUDIO_FADE = pygame.event.custom_type()  # music fade steps, while one is running
+
+def synthesize(notes, volume=TONE_VOLUME):
+    """A Sound playing `notes` as sine tones, in the mixer's format"""
+    frequency, fmt, channels = pygame.mixer.get_init()
+    if fmt != -16:
+        return None  # only the default signed 16-bit format is synthesized
+    samples = array.array('h')
+    for pitch, seconds in notes:
+        n = int(frequency * seconds)
+        ramp = max(1, min(n // 2, int(frequency * TONE_RAMP)))
+        step = 2 * math.pi * pitch / frequency
+        for i in range(n):
+            envelope = min(1.0, i / ramp, (n - i) / ramp)
+            samples.extend([int(32767 * volume * envelope * math.sin(step * i))] * channels)
+    return pygame.mixer.Sound(buffer=samples.tobytes())
+
+def decode_effect(name):
+    path = EFFECT_FILES.get(name)
+    if path and os.path.exists(path):
+        try:
+            return assetcache.load_sound(path)
+        except:
+            pass
+    if name in EFFECT_NOTES:
+        return synthesize(EFFECT_NOTES[name])
+    return None
+
+def sound_bytes(sound):
+    frequency, fmt, channels = pygame.mixer.get_init()
+    return int(sound.get_length() * frequency) * channels * (abs(fmt) // 8)
+
+class SoundCache:
+    # Decoded effects, least recently used dropped first once they take
+    # more than max_bytes. A dropped effect is decoded again (from the
+    # on-disk PCM cache) next time. Filled from the asset loader thread,
+    # so it is locked.
+    def __init__(self, max_bytes=SFX_CACHE_BYTES, decode=decode_effect):
+        self.max_bytes = max_bytes  # 0 disables caching
+        self.decode = decode
+        self.sounds = OrderedDict()  # name -> (Sound, bytes)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        with self.lock:
+            entry = self.sounds.get(name)
+            if entry is not None:
+                self.sounds.move_to_end(name)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        sound = self.decode(name)
+        if sound is None:
+            return None
+        size = sound_bytes(sound)
+        with self.lock:
+            if name not in self.sounds and size <= self.max_bytes:
+                self.sounds[name] = (sound, size)
+                self.bytes += size
+                while self.bytes > self.max_bytes:
+                    _, (_, dropped) = self.sounds.popitem(last=False)
+                    self.bytes -= dropped
+                    self.evictions += 1
+        return sound
+
+    def __len__(self):
+        return len(self.sounds)
+
+    def stats_line(self):
+        return (f"sfx cache {len(self)} sounds, {self.bytes / 1024:.0f}/{self.max_bytes / 1024:.0f} KB: "
+                f"{self.hits} hits, {self.misses} misses, {self.evictions} evicted")
+
+class AudioEngine:
+    def __init__(self, cache=None, channels=SFX_CHANNELS):
+        self.cache = cache if cache is not None else SoundCache()
+        self.enabled = pygame.mixer.get_init() is not None
+        self.channels = []
+        self.next_channel = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)  # seconds spent in play()
+        self.music = False
+        self.fade = None  # (start time, duration, from volume, to volume)
+        self.ducked_by = None  # channel of the jingle the music is faded under
+        if self.enabled:
+            if pygame.mixer.get_num_channels() < channels:
+                pygame.mixer.set_num_channels(channels)
+            # Reserved channels are never handed out to Sound.play()
+            pygame.mixer.set_reserved(channels)
+            self.channels = [pygame.mixer.Channel(i) for i in range(channels)]
+
+    # Effects
+    def preload(self, names=None):
+        for name in names or list(EFFECT_FILES):
+            self.cache.get(name)
+
+    def _channel(self):
+        # The next idle channel in turn; with all busy, the next in turn is
+        # the one that started longest ago
+        count = len(self.channels)
+        for i in range(count):
+            index = (self.next_channel + i) % count
+            if not self.channels[index].get_busy():
+                break
+        else:
+            index = self.next_channel
+        self.next_channel = (index + 1) % count
+        return self.channels[index]
+
+    def play(self, name, fade_ms=0):
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        sound = self.cache.get(name)
+        if sound is None:
+            return None
+        channel = self._channel()
+        channel.play(sound, fade_ms=fade_ms)
+        self.latencies.append(time.perf_counter() - start)
+        return channel
+
+    def buffer_latency(self):
+        # Worst case from play() to the speaker: two mixer buffers
+        frequency = pygame.mixer.get_init()[0] if self.enabled else AUDIO_FREQUENCY
+        return 2 * AUDIO_BUFFER / frequency
+
+    def trigger_latency(self, p=99):
+        """Seconds from a trigger to output at percentile p of recent plays"""
+        values = sorted(self.latencies)
+        if not values:
+            return self.buffer_latency()
+        return values[min(len(values) - 1, int(p / 100 * len(values)))] + self.buffer_latency()
+
+    def stats_line(self):
+        if not self.enabled:
+            return "audio off"
+        return (f"audio: trigger p99 {self.trigger_latency() * 1e3:.1f} ms "
+                f"({AUDIO_BUFFER}-frame buffer); {self.cache.stats_line()}")
+
+    # Music
+    def start_music(self, path=MUSIC_FILE, volume=MUSIC_VOLUME):
+        if not self.enabled or not os.path.exists(path):
+            return False
+        try:
+            pygame.mixer.music.load(path)
+        except:
+            return False
+        pygame.mixer.music.set_volume(volume)
+        pygame.mixer.music.play(-1)
+        self.music = True
+        return True
+
+    def fade_music(self, volume, duration=FADE_TIME):
+        if not self.music:
+            return
+        self.fade = (time.monotonic(), duration, pygame.mixer.music.get_volume(), volume)
+        pygame.time.set_timer(AUDIO_FADE, FADE_STEP_MS)
+        self.update()
+
+    def crossfade_to(self, name, duration=FADE_TIME):
+        # Duck the music under a jingle; it comes back up when the jingle ends
+        channel = self.play(name, fade_ms=int(duration * 1000))
+        if channel is not None:
+            self.ducked_by = channel
+            self.fade_music(DUCK_VOLUME, duration)
+        return channel
+
+    def restore_music(self, duration=FADE_TIME):
+        self.ducked_by = None
+        self.fade_music(MUSIC_VOLUME, duration)
+
+    def update(self):
+        if self.fade is not None:
+            start, duration, begin, end = self.fade
+            t = min(1.0, (time.monotonic() - start) / duration) if duration > 0 else 1.0
+            pygame.mixer.music.set_volume(begin + (end - begin) * t)
+            if t >= 1.0:
+                self.fade = None
+        elif self.ducked_by is not None and not self.ducked_by.get_busy():
+            self.restore_music()
+        if self.fade is None and self.ducked_by is None:
+            pygame.time.set_timer(AUDIO_FADE, 0)
+
+    def handle_event(self, event):
+        # For event loops: steps a running music fade
+        if event.type != AUDIO_FADE:
+            return False
+        self.update()
+        return True
@@ -0,0 +1,426 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Benchmarks run headless: set SDL's dummy drivers before pygame is imported
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+import audio
+import engine
+import game
+import gameclock
+import rendertarget
+import replay
+import snapshot
+import textcache
+
+SEED = 1234
+DEFAULT_SIZES = [5, 10, 25, 50, 100, 250, 500, 1000]
+# Full pair lists grow with the square of the cell count; past this many
+# cells only the first STREAM_PAIRS pairs are taken from the lazy iterators
+FULL_ENUMERATION_CELLS = 2500
+STREAM_PAIRS = 1000
+CLICK_INTERVAL = 0.75  # seconds between clicks in recorded_session
+MIN_TIME = 0.2  # seconds of repeats per measurement
+MAX_REPEAT = 1000
+REGRESSION_THRESHOLD = 1.25
+
+def time_call(func, repeat=200):
+    # Mean seconds per call over `repeat` calls, after one warm-up call
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+def measure(func, setup=None):
+    # (mean seconds, peak bytes). Timing repeats until MIN_TIME has passed;
+    # peak memory comes from one separate run under tracemalloc.
+    arg = setup() if setup else None
+    call = (lambda: func(arg)) if setup else func
+
+    tracemalloc.start()
+    call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    runs = 0
+    elapsed = 0.0
+    while elapsed < MIN_TIME and runs < MAX_REPEAT:
+        if setup:
+            arg = setup()
+        start = time.perf_counter()
+        call()
+        elapsed += time.perf_counter() - start
+        runs += 1
+    return elapsed / runs, peak
+
+# The background as it used to be drawn: re-randomised on every frame
+def legacy_draw_space_background():
+    screen = game.screen
+    screen.fill(game.DARK_SPACE)
+    for _ in range(100):
+        x = random.randint(0, game.SCREEN_WIDTH)
+        y = random.randint(0, game.SCREEN_HEIGHT)
+        size = random.randint(1, 2)
+        brightness = random.randint(150, 255)
+        pygame.draw.circle(screen, (brightness, brightness, brightness), (x, y), size)
+    pygame.draw.circle(screen, (40, 40, 100), (game.SCREEN_WIDTH - 100, 100), 50)
+    pygame.draw.circle(screen, (100, 40, 100), (100, game.SCREEN_HEIGHT - 100), 30)
+
+def bench_background(args):
+    repeat = 500
+    legacy = time_call(legacy_draw_space_background, repeat)
+    cached = time_call(game.draw_space_background, repeat)
+    print("background per frame:")
+    print(f"  legacy   {legacy * 1e6:8.1f} us")
+    print(f"  cached   {cached * 1e6:8.1f} us  ({legacy / cached:.1f}x faster)")
+
+# Info panel and a button, as drawn by a full frame: direct font.render
+# against the shared text cache, with the timer ticking once per second
+def bench_text(args):
+    repeat = 600
+    button = game.Button(100, 100, 240, 60, "LAUNCH MISSION")
+    frame = itertools.count()
+    def draw():
+        time_left = 120 - next(frame) / 60
+        game.draw_game_info(1, 25, time_left, "Find matching pairs", 5)
+        button.draw(game.screen)
+    saved = textcache.text_cache
+    print("info panel + button per frame:")
+    try:
+        textcache.text_cache = textcache.TextCache(0)
+        direct = time_call(draw, repeat)
+        textcache.text_cache = cache = textcache.TextCache()
+        cached = time_call(draw, repeat)
+    finally:
+        textcache.text_cache = saved
+    print(f"  font.render  {direct * 1e6:8.1f} us")
+    print(f"  text cache   {cached * 1e6:8.1f} us  ({direct / cached:.1f}x faster)")
+    print(f"  {cache.stats_line()}")
+
+# Sound effects: seconds from a trigger to output, decoding each effect when
+# it is triggered against playing it from the pre-decoded cache. Output
+# follows play() by up to two mixer buffers.
+AUDIO_TRIGGERS = 400
+
+def bench_audio(args):
+    names = [name for name in audio.EFFECT_NOTES]
+    def triggers(player):
+        player.latencies.clear()
+        for i in range(AUDIO_TRIGGERS):
+            player.play(names[i % len(names)])
+        pygame.mixer.stop()
+        values = sorted(player.latencies)
+        return values[len(values) // 2], values[int(len(values) * 0.99)]
+    buffer_ms = game.audio_engine.buffer_latency() * 1e3
+    frame_ms = 1000 / game.FPS
+    print(f"sound effect trigger ({audio.AUDIO_BUFFER}-frame mixer buffer = {buffer_ms:.1f} ms, "
+          f"frame {frame_ms:.1f} ms):")
+    for label, max_bytes in [("uncached", 0), ("pre-decoded cache", audio.SFX_CACHE_BYTES)]:
+        player = audio.AudioEngine(audio.SoundCache(max_bytes))
+        player.preload(names)
+        p50, p99 = triggers(player)
+        total = p99 * 1e3 + buffer_ms
+        print(f"  {label:<18} play() p50 {p50 * 1e3:7.3f} ms  p99 {p99 * 1e3:7.3f} ms  "
+              f"-> output p99 {total:5.1f} ms ({'within' if total <= frame_ms else 'over'} a frame)")
+
+# Presenting a frame: the 900x700 target shown as it is, and scaled to
+# larger windows smoothly or nearest-neighbour. A full frame repaints the
+# background and shows it all; a dirty frame shows a selected pair of cells
+# and the timer, as a typical frame in a level does.
+DISPLAY_WINDOWS = [(900, 700), (1800, 1400), (1920, 1080)]
+DIRTY_RECTS = [(300, 200, 80, 80), (460, 280, 80, 80), (20, 20, 200, 30)]
+
+def bench_display(args):
+    target = game.render_target
+    saved = target.window.get_size(), target.mode
+    print("frame presented to the window (logical 900x700):")
+    try:
+        for size in DISPLAY_WINDOWS:
+            modes = ['direct'] if size == target.logical_size else list(rendertarget.MODES)
+            for mode in modes:
+                if mode != 'direct':
+                    target.mode = mode
+                game.screen = target.resize(size)
+                def full():
+                    game.draw_space_background()
+                    target.present()
+                full_time = time_call(full, 200)
+                dirty_time = time_call(lambda: target.present(DIRTY_RECTS), 500)
+                window = f"{size[0]}x{size[1]}"
+                print(f"  {window:<10} {mode:<12} full {full_time * 1e3:6.2f} ms  "
+                      f"dirty {dirty_time * 1e3:6.3f} ms")
+    finally:
+        target.mode = saved[1]
+        game.screen = target.resize(saved[0])
+
+# Logic ticks driven by a manual game clock: mission 1 played by a bot that
+# clicks every CLICK_INTERVAL of game time, under different frame times.
+# The outcome must not depend on them, and without frames at all (one
+# clock jump to the time limit) the level runs far faster than real time.
+def clocked_level(frame_time):
+    source = gameclock.ManualClock()
+    game_clock = gameclock.GameClock(source=source)
+    logic = gameclock.FixedStep()
+    state = engine.DEFAULT_MISSIONS[0].make_level(random.Random(SEED))
+    clicks = frames = 0
+    while not state.finished:
+        source.advance(frame_time(frames))
+        frames += 1
+        for t in logic.advance(game_clock.now()):
+            state.tick(t)
+            if t >= (clicks + 1) * CLICK_INTERVAL and not state.finished:
+                pair = next(engine.iter_pairs(state.board), None)
+                if pair is not None:
+                    state.select(*pair[len(state.selected)])
+                clicks += 1
+            if state.finished:
+                break
+    return state, logic.ticks, frames
+
+def bench_clock(args):
+    jitter = random.Random(SEED)
+    patterns = [
+        ("60 FPS", lambda i: 1 / 60),
+        ("20 FPS", lambda i: 1 / 20),
+        ("jitter + 0.5 s stalls", lambda i: 0.5 if i % 50 == 49 else jitter.uniform(0.005, 0.05)),
+        ("headless", lambda i: engine.TIME_PER_LEVEL),
+    ]
+    print(f"mission 1, {gameclock.LOGIC_RATE} logic ticks/s, a click every {CLICK_INTERVAL}s:")
+    for label, frame_time in patterns:
+        start = time.perf_counter()
+        state, ticks, frames = clocked_level(frame_time)
+        wall = time.perf_counter() - start
+        print(f"  {label:<22} {state.state} at {state.level_time:7.3f}s, {state.score} pts, "
+              f"{ticks} ticks, {frames} frames; {wall * 1e3:6.1f} ms "
+              f"({state.level_time / wall:,.0f}x real time)")
+
+# Startup: seconds from launch to the first start-screen frame, and until
+# every background asset is in place. Each run is a fresh interpreter.
+STARTUP_RUNS = 5
+STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import game
+blocking = sys.argv[1] == 'blocking'
+game.init_pygame()
+if blocking:
+    game.wait_for_assets()  # the old behaviour: decode everything first
+game.draw_start_screen(0)
+game.pygame.display.flip()
+first_frame = time.perf_counter() - start
+game.wait_for_assets()
+print(first_frame, time.perf_counter() - start)
+"""
+
+def time_startup(mode, cache_dir):
+    env = dict(os.environ, SPACE_MATCH_CACHE_DIR=cache_dir)
+    out = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, mode], env=env,
+                         cwd=os.path.dirname(os.path.abspath(__file__)),
+                         capture_output=True, text=True, check=True).stdout
+    return [float(x) for x in out.split()[-2:]]
+
+def bench_startup(args):
+    print("startup (median of %d launches):" % STARTUP_RUNS)
+    for label, mode, warm in [("blocking, no cache", 'blocking', False),
+                              ("background, cold cache", 'background', False),
+                              ("background, warm cache", 'background', True)]:
+        runs = []
+        with tempfile.TemporaryDirectory() as root:
+            for i in range(STARTUP_RUNS):
+                cache_dir = os.path.join(root, 'warm' if warm else str(i))
+                if warm and i == 0:
+                    time_startup(mode, cache_dir)  # fill the cache
+                runs.append(time_startup(mode, cache_dir))
+        first = statistics.median(r[0] for r in runs)
+        ready = statistics.median(r[1] for r in runs)
+        print(f"  {label:<24} first frame {first * 1e3:7.1f} ms   assets ready {ready * 1e3:7.1f} ms")
+
+# Grid-size sweep
+def seeded_board(size):
+    return engine.generate_board(size, size, random.Random(SEED))
+
+def half_cleared(board):
+    # Hide a fixed half of the cells so boards look mid-game
+    cells = board.rows * board.cols
+    for i in random.Random(SEED).sample(range(cells), cells // 2):
+        board.hide(i // board.cols, i % board.cols)
+    return board
+
+def pair_search(find, stream):
+    def run(board):
+        if board.rows * board.cols <= FULL_ENUMERATION_CELLS:
+            find(board)
+        else:
+            for _ in itertools.islice(stream(board), STREAM_PAIRS):
+                pass
+    return run
+
+def level_renderer(size, full):
+    random.seed(SEED)
+    state = engine.Level(1, size, size, random.Random(SEED))
+    renderer = game.LevelRenderer(state, game.make_viewport(state.board), full_frame=full)
+    renderer.draw(0.0)  # first frame is always a full one
+    return renderer
+
+def level_frame(full):
+    def setup(size):
+        return level_renderer(size, full)
+    def run(renderer):
+        renderer.draw(0.0)
+    return setup, run
+
+def scroll_frame(renderer):
+    # Scroll one cell (bouncing at the edge) and draw the dirty frame
+    viewport = renderer.viewport
+    if not viewport.scroll(viewport.cell_size, viewport.cell_size):
+        viewport.offset_x = viewport.offset_y = 0
+    renderer.invalidate_grid()
+    renderer.draw(0.0)
+
+def hit_test(renderer):
+    x, y, width, height = renderer.viewport.area
+    for i in range(100):
+        renderer.viewport.cell_at((x + i * 7 % width, y + i * 13 % height))
+
+def recorded_session(size):
+    # A two-mission session that takes the first valid pair, one click
+    # every CLICK_INTERVAL seconds, recorded like play_level does
+    session = replay.Replay()
+    rng = random.Random(SEED)
+    for mission in engine.DEFAULT_MISSIONS:
+        seed = rng.getrandbits(64)
+        state = mission.make_level(random.Random(seed), size, size)
+        recording = session.start_level(seed, state)
+        t = 0.0
+        while not state.finished:
+            pair = next(engine.iter_pairs(state.board), None)
+            if pair is None:
+                break
+            for cell in pair:
+                t += CLICK_INTERVAL
+                state.tick(t)
+                state.select(*cell)
+                recording.select(t, *cell)
+            recording.checkpoint(t, state)
+        if not state.finished:
+            t = max(t, state.time_limit)  # out of pairs: wait for the timer
+        state.tick(t)
+        recording.end(t, state)
+    return session
+
+def suspended_level(size):
+    # A half-played level, as snapshotted when the window is closed
+    state = engine.Level(1, size, size, board=half_cleared(seeded_board(size)))
+    return snapshot.Snapshot(SEED, state)
+
+def suite_operations(size):
+    board = seeded_board(size)
+    full_setup, full_run = level_frame(True)
+    dirty_setup, dirty_run = level_frame(False)
+    return {
+        'generate_grid': (lambda: game.generate_grid(size, size), None),
+        'generate_board': (lambda: seeded_board(size), None),
+        'generate_level2': (lambda: engine.generate_board(size, size, random.Random(SEED), engine.SUM_7,
+                                                          min_decoys=3), None),
+        'find_identical_pairs': (pair_search(engine.find_identical_pairs, engine.iter_identical_pairs),
+                                 lambda: half_cleared(seeded_board(size))),
+        'find_sum_pairs': (pair_search(engine.find_sum_pairs, engine.iter_sum_pairs),
+                           lambda: half_cleared(seeded_board(size))),
+        'has_pairs': (board.has_pairs, None),
+        'cell_draw': (game.draw_grid, lambda: game.build_grid(board)),
+        'frame_full': (full_run, lambda: full_setup(size)),
+        'frame_dirty': (dirty_run, lambda: dirty_setup(size)),
+        'frame_scroll': (scroll_frame, lambda: level_renderer(size, False)),
+        'hit_test_x100': (hit_test, lambda: level_renderer(size, False)),
+        'replay_session': (replay.play, lambda: recorded_session(size)),
+        'snapshot_save': (snapshot.Snapshot.to_bytes, lambda: suspended_level(size)),
+        'snapshot_load': (snapshot.Snapshot.from_bytes, lambda: suspended_level(size).to_bytes()),
+    }
+
+def run_suite(sizes, only=None):
+    results = {}
+    for size in sizes:
+        random.seed(SEED)
+        for name, (func, setup) in suite_operations(size).items():
+            if only and name not in only:
+                continue
+            seconds, peak = measure(func, setup)
+            results[f"{name}/{size}"] = {'seconds': seconds, 'peak_bytes': peak}
+            print(f"{name:<22} {size:>5}x{size:<5} {seconds * 1e3:11.3f} ms  peak {peak / 1024:10.1f} KiB")
+    return results
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        ratio = result['seconds'] / baseline[key]['seconds']
+        if ratio > threshold:
+            regressions.append((key, ratio))
+    return regressions
+
+def bench_suite(args):
+    results = run_suite(args.sizes, args.only)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+        print(f"baseline written to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for key, ratio in regressions:
+            print(f"REGRESSION {key}: {ratio:.2f}x baseline")
+        if regressions:
+            return 1
+        print(f"no regressions against {args.baseline}")
+    return 0
+
+BENCHMARKS = {
+    'audio': bench_audio,
+    'background': bench_background,
+    'clock': bench_clock,
+    'display': bench_display,
+    'startup': bench_startup,
+    'text': bench_text,
+    'suite': bench_suite,
+}
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Space Number Match benchmarks")
+    parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+                        help=f"any of: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="GRID_SIZE values to sweep")
+    parser.add_argument('--only', nargs='+', help="suite operations to run")
+    parser.add_argument('--baseline', help="JSON results to compare against")
+    parser.add_argument('--save-baseline', help="write results to this JSON file")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r}")
+    return args
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    game.init_pygame()
+    status = 0
+    for name in args.benchmarks or list(BENCHMARKS):
+        status = BENCHMARKS[name](args) or status
+    pygame.quit()
+    sys.exit(status)
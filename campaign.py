@@ -0,0 +1,75 @@
+import json
+
+import engine
+
+# Campaigns: any number of missions, read from a JSON level-spec file.
+#
+#   {
+#     "defaults": {"grid_size": 5, "time_limit": 120},
+#     "missions": [
+#       {"rule": "match", "target_pairs": 10, "end_when_stuck": false},
+#       {"rule": "sum-7"},
+#       {"rule": "diff-2", "grid_size": 6, "time_limit": 90, "min_decoys": 2}
+#     ]
+#   }
+#
+# Each mission takes a rule ("match", "sum-<k>" or "diff-<k>") and
+# optionally grid_size (or rows and cols), time_limit, target_pairs,
+# points_per_pair, end_when_stuck and min_decoys; "defaults" applies to
+# every mission. Rules are compiled once by engine.parse_rule and shared.
+
+CAMPAIGN_FILE = "campaign.json"
+
+MISSION_KEYS = {'rule', 'grid_size', 'rows', 'cols', 'time_limit', 'target_pairs',
+                'points_per_pair', 'end_when_stuck', 'min_decoys'}
+
+def parse_mission(number, spec):
+    unknown = set(spec) - MISSION_KEYS
+    if unknown:
+        raise ValueError(f"mission {number}: unknown keys {', '.join(sorted(unknown))}")
+    if 'rule' not in spec:
+        raise ValueError(f"mission {number}: no rule")
+    size = spec.get('grid_size', engine.GRID_SIZE)
+    mission = engine.Mission(
+        number,
+        engine.parse_rule(spec['rule']),
+        rows=spec.get('rows', size),
+        cols=spec.get('cols', size),
+        time_limit=spec.get('time_limit', engine.TIME_PER_LEVEL),
+        target_pairs=spec.get('target_pairs', engine.TOTAL_PAIRS_PER_LEVEL),
+        points_per_pair=spec.get('points_per_pair', engine.POINTS_PER_PAIR),
+        end_when_stuck=spec.get('end_when_stuck', True),
+        min_decoys=spec.get('min_decoys', 0),
+    )
+    # Fail at load time rather than when the board is generated
+    try:
+        engine.check_layout(mission.rows, mission.cols, mission.rule,
+                            mission.target_pairs, mission.min_decoys)
+    except ValueError as e:
+        raise ValueError(f"mission {number}: {e}")
+    return mission
+
+def parse_campaign(spec):
+    defaults = spec.get('defaults', {})
+    missions = spec.get('missions')
+    if not missions:
+        raise ValueError("campaign has no missions")
+    return [parse_mission(i + 1, {**defaults, **mission}) for i, mission in enumerate(missions)]
+
+def load_campaign(path=CAMPAIGN_FILE):
+    with open(path) as f:
+        return parse_campaign(json.load(f))
+
+def check_grid_size(missions, size):
+    # ValueError unless every mission fits on a size x size board, for a
+    # grid size given on the command line over the missions' own
+    if size < 1:
+        raise ValueError(f"grid size must be at least 1, not {size}")
+    for mission in missions:
+        try:
+            engine.check_layout(size, size, mission.rule, mission.target_pairs, mission.min_decoys)
+        except ValueError as e:
+            raise ValueError(f"mission {mission.number}: {e}")
+
+def max_score(missions):
+    return sum(mission.max_score for mission in missions)
@@ -0,0 +1,91 @@
+import heapq
+import itertools
+
+import pygame
+
+# Timed overlays and animations driven by the frame clock.
+# Effects sit in a heap ordered by end time, so expiring them is O(log n)
+# however many are in flight, and nothing ever sleeps.
+
+class Effect:
+    def __init__(self, start, duration):
+        self.start = start
+        self.duration = duration
+        self.end = start + duration
+
+    def progress(self, now):
+        if self.duration <= 0:
+            return 1.0
+        return min(1.0, max(0.0, (now - self.start) / self.duration))
+
+    def draw(self, surface, now):
+        # Draw the effect and return the screen rect it covered
+        raise NotImplementedError
+
+# Text that holds, then fades out over the last FADE_PORTION of its life
+class MessageEffect(Effect):
+    FADE_PORTION = 0.4
+
+    def __init__(self, text_surf, center, start, duration):
+        super().__init__(start, duration)
+        self.text_surf = text_surf
+        self.rect = text_surf.get_rect(center=center)
+
+    def alpha(self, now):
+        remaining = 1.0 - self.progress(now)
+        if remaining >= self.FADE_PORTION:
+            return 255
+        return int(255 * remaining / self.FADE_PORTION)
+
+    def draw(self, surface, now):
+        self.text_surf.set_alpha(self.alpha(now))
+        surface.blit(self.text_surf, self.rect)
+        self.text_surf.set_alpha(None)  # the surface may be shared via the text cache
+        return self.rect
+
+# Pulsing outline around a screen rect, e.g. a hinted cell
+class HighlightEffect(Effect):
+    def __init__(self, rect, color, start, duration, width=4):
+        super().__init__(start, duration)
+        self.rect = rect
+        self.color = color
+        self.width = width
+
+    def draw(self, surface, now):
+        # Two pulses over the effect's life
+        phase = self.progress(now) * 4 % 2
+        alpha = int(255 * (phase if phase < 1 else 2 - phase))
+        outline = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        pygame.draw.rect(outline, (*self.color, alpha), outline.get_rect(), self.width, border_radius=10)
+        surface.blit(outline, self.rect)
+        return self.rect
+
+class EffectScheduler:
+    def __init__(self):
+        self.queue = []
+        self.counter = itertools.count()  # tie-breaker for equal end times
+
+    def __len__(self):
+        return len(self.queue)
+
+    def add(self, effect):
+        heapq.heappush(self.queue, (effect.end, next(self.counter), effect))
+        return effect
+
+    def expire(self, now):
+        # Remove and return every effect that has finished by `now`
+        expired = []
+        while self.queue and self.queue[0][0] <= now:
+            expired.append(heapq.heappop(self.queue)[2])
+        return expired
+
+    def active(self, now):
+        return [effect for _, _, effect in self.queue if effect.start <= now]
+
+    def draw(self, surface, now):
+        # Oldest first, so newer overlays land on top
+        effects = sorted(self.active(now), key=lambda effect: effect.start)
+        return [effect.draw(surface, now) for effect in effects]
+
+    def clear(self):
+        self.queue.clear()
@@ -0,0 +1,511 @@
+import heapq
+import random
+from array import array
+from bisect import bisect_right
+
+# Headless board/rules engine for Space Number Match.
+# Pure Python, no pygame: safe to import from simulations and worker processes.
+
+# Game constants
+GRID_SIZE = 5
+TIME_PER_LEVEL = 120
+TOTAL_PAIRS_PER_LEVEL = 10
+POINTS_PER_PAIR = 5
+MAX_SCORE_PER_LEVEL = TOTAL_PAIRS_PER_LEVEL * POINTS_PER_PAIR
+SUM_TARGET = 7
+
+# Level outcomes
+PLAYING = "playing"
+COMPLETE = "complete"
+TIME_UP = "time_up"
+NO_MORE_PAIRS = "no_more_pairs"
+
+# Results of a selection
+SELECTED = "selected"
+DESELECTED = "deselected"
+VALID_PAIR = "valid_pair"
+INVALID_PAIR = "invalid_pair"
+IGNORED = "ignored"
+
+# Pair rules, compiled once into lookup tables. The rule's predicate runs
+# only while compiling; click validation, the O(1) availability index, pair
+# streaming, the generator and the solver all read the tables, so every
+# rule (match, sum-to-k, difference-k) is equally fast.
+RULE_KINDS = ('match', 'sum', 'diff')
+NUMBERS = range(1, 10)
+
+class Rule:
+    def __init__(self, kind, k=0):
+        tests = {
+            'match': lambda a, b: a == b,
+            'sum': lambda a, b: a + b == k,
+            'diff': lambda a, b: abs(a - b) == k,
+        }
+        if kind not in tests:
+            raise ValueError(f"unknown rule {kind!r}, expected one of {', '.join(RULE_KINDS)}")
+        self.kind = kind
+        self.k = 0 if kind == 'match' else k
+        test = tests[kind]
+        # table[a * 10 + b]: can a cell holding a pair with one holding b
+        self.table = bytes(bool(a and b and test(a, b)) for a in range(10) for b in range(10))
+        self.partners = tuple(tuple(b for b in NUMBERS if self.table[a * 10 + b])
+                              for a in range(10))
+        self.pairs = tuple((a, b) for a in NUMBERS for b in range(a, 10) if self.table[a * 10 + b])
+        if not self.pairs:
+            raise ValueError(f"rule {self.name} allows no pairs")
+        self.pairable = [n for n in NUMBERS if self.partners[n]]
+        self.unpairable = [n for n in NUMBERS if not self.partners[n]]
+        self.self_only = all(self.partners[n] in ((n,), ()) for n in NUMBERS)
+        self.chains = self._chains()
+
+    @property
+    def name(self):
+        return self.kind if self.kind == 'match' else f"{self.kind}-{self.k}"
+
+    @property
+    def goal(self):
+        # What the player looks for, e.g. "pairs that sum to 7"
+        if self.kind == 'match':
+            return "matching number pairs"
+        if self.kind == 'sum':
+            return f"pairs that sum to {self.k}"
+        return f"pairs that differ by {self.k}"
+
+    @property
+    def max_decoys(self):
+        # Decoys are unpairable numbers when there are any (7, 8, 9 for sum
+        # to 7; 2 to 9 for sum to 2), as many as wanted. When every number
+        # pairs only with itself, a decoy is a number used nowhere else.
+        if self.unpairable:
+            return None
+        if self.self_only:
+            return len(self.pairable) - 1
+        return 0
+
+    @property
+    def target_text(self):
+        return f"FIND {self.goal.upper()}"
+
+    def is_valid(self, n1, n2):
+        return self.table[n1 * 10 + n2]
+
+    def _chains(self):
+        # The partner graph as simple paths: a number that pairs with itself
+        # stands alone, every other number sits on a chain such as 1-6 (sum
+        # to 7) or 1-3-5-7-9 (difference 2). max_pairs relies on this shape.
+        chains = []
+        seen = set()
+        for n in self.pairable:
+            others = [p for p in self.partners[n] if p != n]
+            if n in seen or len(others) > 1:
+                continue  # chains are walked from one of their ends
+            if len(self.partners[n]) > len(others):
+                if others:
+                    raise ValueError(f"rule {self.name}: {n} pairs with itself and others")
+                chains.append((n,))
+                seen.add(n)
+                continue
+            chain = [n]
+            seen.add(n)
+            prev = None
+            while True:
+                cur = chain[-1]
+                nxt = [p for p in self.partners[cur] if p != cur and p != prev]
+                if not nxt:
+                    break
+                if len(nxt) > 1 or nxt[0] in seen or nxt[0] in self.partners[nxt[0]]:
+                    raise ValueError(f"rule {self.name}: partner graph is not a set of chains")
+                prev = cur
+                chain.append(nxt[0])
+                seen.add(nxt[0])
+            chains.append(tuple(chain))
+        if len(seen) != len(self.pairable):
+            raise ValueError(f"rule {self.name}: partner graph has a cycle")
+        return tuple(chains)
+
+    def count_pairs(self, counts):
+        # Unordered valid cell pairs among per-number counts
+        total = 0
+        for a, b in self.pairs:
+            total += counts[a] * (counts[a] - 1) // 2 if a == b else counts[a] * counts[b]
+        return total
+
+    def max_pairs(self, counts):
+        # Maximum number of disjoint valid pairs the counts can still give.
+        # On a chain, pairing the end number with its only neighbour as often
+        # as possible is always optimal, so one walk per chain is exact. O(9).
+        total = 0
+        for chain in self.chains:
+            if len(chain) == 1:
+                total += counts[chain[0]] // 2
+                continue
+            spare = counts[chain[0]]
+            for n in chain[1:]:
+                used = min(spare, counts[n])
+                total += used
+                spare = counts[n] - used
+        return total
+
+_rules = {}
+
+def get_rule(kind, k=0):
+    # Rules are compiled once and shared
+    key = (kind, 0 if kind == 'match' else k)
+    rule = _rules.get(key)
+    if rule is None:
+        rule = _rules[key] = Rule(kind, k)
+    return rule
+
+def parse_rule(spec):
+    """A rule from its name: "match", "sum-7", "diff-2", ..."""
+    kind, _, k = spec.partition('-')
+    if kind == 'match' and not k:
+        return get_rule('match')
+    if kind in ('sum', 'diff') and k.isdigit():
+        return get_rule(kind, int(k))
+    raise ValueError(f"bad rule {spec!r}: expected match, sum-<k> or diff-<k>")
+
+MATCH = get_rule('match')
+SUM_7 = get_rule('sum', SUM_TARGET)
+
+class Board:
+    def __init__(self, rows, cols, numbers, rule=MATCH, visible=None):
+        # visible: 0/1 per cell, for a board restored part-way through
+        # (default: every cell visible)
+        cells = rows * cols
+        if len(numbers) != cells:
+            raise ValueError(f"expected {cells} numbers, got {len(numbers)}")
+        self.rows = rows
+        self.cols = cols
+        self.rule = rule
+        # Row-major cell storage, one byte per cell: numbers are 1-9 and
+        # visibility is a 0/1 flag (plus `shown`, below). A 1000x1000 board
+        # is 3 MB, not 16 MB of list pointers.
+        self.numbers = bytearray(numbers)
+        if visible is None:
+            self.visible = bytearray(b'\x01') * cells
+            shown = self.numbers
+        else:
+            if len(visible) != cells:
+                raise ValueError(f"expected {cells} visibility flags, got {len(visible)}")
+            self.visible = bytearray(visible)
+            # Hidden cells' numbers zeroed without a per-cell loop: 0/1 times
+            # 0xFF is a 0x00/0xFF byte mask, with no carries between bytes
+            mask = int.from_bytes(self.visible, 'little') * 0xFF
+            shown = (int.from_bytes(self.numbers, 'little') & mask).to_bytes(cells, 'little')
+
+        # Index kept up to date by hide(), so the end-of-level checks are
+        # O(1) whatever the grid size. `shown` is the numbers with hidden
+        # cells zeroed, so a visible cell of a number is one bytes.find
+        # (memchr) away.
+        self.shown = bytearray(shown)
+        self.counts = [0] + [self.shown.count(n) for n in range(1, 10)]
+        self._buckets = None
+        self.visible_total = cells if visible is None else sum(self.counts)
+        self.available_pairs = rule.count_pairs(self.counts)
+
+    @property
+    def buckets(self):
+        # Flat cell indices per number, built on first use by pair streaming.
+        # Unsigned int arrays: 4 bytes per cell instead of a pointer plus an
+        # int object.
+        if self._buckets is None:
+            self._buckets = [array('I') for _ in range(10)]
+            for i, n in enumerate(self.numbers):
+                self._buckets[n].append(i)
+        return self._buckets
+
+    def number(self, row, col):
+        return self.numbers[row * self.cols + col]
+
+    def is_visible(self, row, col):
+        return self.visible[row * self.cols + col]
+
+    def hide(self, row, col):
+        i = row * self.cols + col
+        if not self.visible[i]:
+            return
+        self.visible[i] = 0
+        self.shown[i] = 0
+        n = self.numbers[i]
+        self.counts[n] -= 1
+        self.visible_total -= 1
+        # The hidden cell loses one pairing with every remaining partner
+        for partner in self.rule.partners[n]:
+            self.available_pairs -= self.counts[partner]
+
+    def visible_count(self):
+        return self.visible_total
+
+    def pair_count(self):
+        # Valid cell pairs still on the board under its rule
+        return self.available_pairs
+
+    def has_pairs(self):
+        return self.available_pairs > 0
+
+    def max_pairs(self, rule=None):
+        return (rule or self.rule).max_pairs(self.counts)
+
+def check_layout(rows, cols, rule, target_pairs, min_decoys):
+    # ValueError unless a rows x cols board can hold the pairs and decoys
+    if 2 * target_pairs + min_decoys > rows * cols:
+        raise ValueError(f"a {rows}x{cols} grid cannot hold {target_pairs} pairs "
+                         f"and {min_decoys} decoys")
+    limit = rule.max_decoys
+    if limit == 0 and min_decoys:
+        raise ValueError(f"rule {rule.name} has no unpairable numbers for decoys")
+    if limit is not None and min_decoys > limit:
+        raise ValueError(f"at most {limit} decoys fit alongside {rule.name} pairs")
+
+# Generate board with `target_pairs` guaranteed pairs for the rule, at
+# least `min_decoys` cells that can never be paired, and random extras
+def generate_numbers(rows, cols, rng=random, rule=MATCH,
+                     target_pairs=TOTAL_PAIRS_PER_LEVEL, min_decoys=0):
+    check_layout(rows, cols, rule, target_pairs, min_decoys)
+    cells = rows * cols
+
+    # Decoys (see Rule.max_decoys). When every number pairs only with
+    # itself, decoys are numbers that appear nowhere else, so they are picked
+    # first and kept out of the pairs and extras. Otherwise any number
+    # without a partner will do.
+    if rule.self_only and not rule.unpairable:
+        decoys = rng.sample(NUMBERS, min_decoys)
+        pair_values = [n for n in rule.pairable if n not in decoys]
+        extra_values = pair_values
+    else:
+        decoys = rng.choices(rule.unpairable, k=min_decoys)
+        pair_values = rule.pairable
+        extra_values = NUMBERS
+
+    # Planted pairs
+    planted = []
+    for num in rng.choices(pair_values, k=target_pairs):
+        partners = rule.partners[num]
+        planted.append(num)
+        planted.append(partners[0] if len(partners) == 1 else rng.choice(partners))
+    planted.extend(decoys)
+
+    # Extras fill the grid (5 for 5x5), then the planted numbers go to random
+    # distinct cells: the same layout distribution as shuffling everything,
+    # without a full shuffle on large grids
+    numbers = rng.choices(extra_values, k=cells)
+    for i, num in zip(rng.sample(range(cells), len(planted)), planted):
+        numbers[i] = num
+    return numbers
+
+def generate_board(rows, cols, rng=random, rule=MATCH,
+                   target_pairs=TOTAL_PAIRS_PER_LEVEL, min_decoys=0):
+    board = Board(rows, cols, generate_numbers(rows, cols, rng, rule, target_pairs, min_decoys), rule)
+    # Guaranteed by construction; the solver check is O(9), so it stays on
+    if board.max_pairs() < target_pairs:
+        raise ValueError(f"a {rows}x{cols} {rule.name} board came out with fewer than "
+                         f"{target_pairs} pairs")
+    return board
+
+# Positions of one visible cell holding `a` and another holding `b`
+# (the first of each in row-major order). A memchr over `shown`: no bucket
+# build and no walk past hidden cells, ~0.1 ms on a 1000x1000 board.
+def find_value_pair(board, a, b):
+    shown = board.shown
+    first = shown.find(a)
+    if first < 0:
+        return None
+    second = shown.find(b, first + 1) if a == b else shown.find(b)
+    if second < 0:
+        return None
+    return [divmod(first, board.cols), divmod(second, board.cols)]
+
+# Stream pairs lazily as ((r1, c1), (r2, c2)), in row-major order of the
+# first cell and then of its partner, without materialising the full list.
+def iter_pairs(board, rule=None):
+    partners = (rule or board.rule).partners
+    cols = board.cols
+    visible = board.visible
+    counts = board.counts
+    buckets = board.buckets
+    for i, n in enumerate(board.numbers):
+        if not visible[i]:
+            continue
+        candidates = partners[n]
+        if len(candidates) == 1:
+            if not counts[candidates[0]]:
+                continue
+            bucket = buckets[candidates[0]]
+            later = bucket[bisect_right(bucket, i):]
+        elif candidates:
+            # Several partner numbers (difference rules): merge to keep order
+            later = heapq.merge(*(buckets[p][bisect_right(buckets[p], i):]
+                                  for p in candidates if counts[p]))
+        else:
+            continue
+        for j in later:
+            if visible[j]:
+                yield (i // cols, i % cols), (j // cols, j % cols)
+
+def iter_identical_pairs(board):
+    return iter_pairs(board, MATCH)
+
+def iter_sum_pairs(board, target=SUM_TARGET):
+    return iter_pairs(board, get_rule('sum', target))
+
+# Find pairs
+def _collect_pairs(board, pair_iter):
+    pairs = []
+    positions = []
+    for (r1, c1), (r2, c2) in pair_iter:
+        pairs.append((board.number(r1, c1), board.number(r2, c2)))
+        positions.append([(r1, c1), (r2, c2)])
+    return pairs, positions
+
+def find_pairs(board, rule=None):
+    return _collect_pairs(board, iter_pairs(board, rule))
+
+def find_identical_pairs(board):
+    return _collect_pairs(board, iter_identical_pairs(board))
+
+def find_sum_pairs(board, target=SUM_TARGET):
+    return _collect_pairs(board, iter_sum_pairs(board, target))
+
+def count_pairs_found(board):
+    cells_cleared = board.rows * board.cols - board.visible_count()
+    return cells_cleared // 2
+
+# A mission of a campaign: its rule, board and limits
+class Mission:
+    def __init__(self, number, rule, rows=GRID_SIZE, cols=GRID_SIZE,
+                 time_limit=TIME_PER_LEVEL, target_pairs=TOTAL_PAIRS_PER_LEVEL,
+                 points_per_pair=POINTS_PER_PAIR, end_when_stuck=True, min_decoys=0):
+        self.number = number
+        self.rule = rule
+        self.rows = rows
+        self.cols = cols
+        self.time_limit = time_limit
+        self.target_pairs = target_pairs
+        self.points_per_pair = points_per_pair
+        self.end_when_stuck = end_when_stuck  # end early once no valid pair is left
+        self.min_decoys = min_decoys
+
+    @property
+    def max_score(self):
+        return self.target_pairs * self.points_per_pair
+
+    def make_level(self, rng=random, rows=None, cols=None):
+        return Level(self.number, rows or self.rows, cols or self.cols, rng,
+                     time_limit=self.time_limit, target_pairs=self.target_pairs,
+                     points_per_pair=self.points_per_pair, rule=self.rule,
+                     end_when_stuck=self.end_when_stuck, min_decoys=self.min_decoys)
+
+# The standard two-mission game (campaign.json describes the same)
+DEFAULT_MISSIONS = (
+    Mission(1, MATCH, end_when_stuck=False),
+    Mission(2, SUM_7),
+)
+
+def default_mission(level):
+    if not 1 <= level <= len(DEFAULT_MISSIONS):
+        raise ValueError(f"no default mission {level}; pass a rule")
+    return DEFAULT_MISSIONS[level - 1]
+
+# Level state machine: everything play_level decides, minus the drawing.
+# Time is passed in by the caller so headless runs need no wall clock.
+class Level:
+    def __init__(self, level, rows, cols, rng=random, board=None,
+                 time_limit=TIME_PER_LEVEL, target_pairs=TOTAL_PAIRS_PER_LEVEL,
+                 points_per_pair=POINTS_PER_PAIR, rule=None, end_when_stuck=None,
+                 min_decoys=0):
+        # level: the mission number. Without a rule, the rule (and, unless
+        # given, the end condition) are those of that mission in the
+        # standard game; with one, the end condition defaults as a Mission's does.
+        if rule is None:
+            default = default_mission(level)
+            rule = default.rule
+            if end_when_stuck is None:
+                end_when_stuck = default.end_when_stuck
+        elif end_when_stuck is None:
+            end_when_stuck = True
+        self.level = level
+        self.rule = rule
+        self.time_limit = time_limit
+        self.target_pairs = target_pairs
+        self.points_per_pair = points_per_pair
+        self.end_when_stuck = end_when_stuck
+        self.min_decoys = min_decoys
+        if board is None:
+            board = generate_board(rows, cols, rng, rule, target_pairs, min_decoys)
+        self.board = board
+        self.score = 0
+        self.pairs_found = count_pairs_found(self.board)
+        self.selected = []
+        self.time_left = time_limit
+        self.state = PLAYING
+        self.target_text = rule.target_text
+
+    @property
+    def finished(self):
+        return self.state != PLAYING
+
+    @property
+    def level_time(self):
+        return self.time_limit - self.time_left
+
+    def select(self, row, col):
+        if self.finished or not self.board.is_visible(row, col):
+            return IGNORED
+
+        pos = (row, col)
+        if pos in self.selected:
+            self.selected.remove(pos)
+            return DESELECTED
+        if len(self.selected) >= 2:
+            return IGNORED
+
+        self.selected.append(pos)
+        if len(self.selected) < 2:
+            return SELECTED
+        return self._resolve_pair()
+
+    def clear_selection(self):
+        self.selected.clear()
+
+    def _resolve_pair(self):
+        (r1, c1), (r2, c2) = self.selected
+        self.selected.clear()
+        board = self.board
+        if not self.rule.is_valid(board.number(r1, c1), board.number(r2, c2)):
+            return INVALID_PAIR
+
+        board.hide(r1, c1)
+        board.hide(r2, c2)
+        self.score += self.points_per_pair
+        self.pairs_found = count_pairs_found(board)
+        self._check_end()
+        return VALID_PAIR
+
+    def tick(self, elapsed):
+        # elapsed: seconds since the level started
+        if self.finished:
+            return self.state
+        self.time_left = max(0, self.time_limit - elapsed)
+        self._check_end()
+        return self.state
+
+    def restore(self, score, pairs_found, time_left, selected):
+        # Carry on from a saved point (snapshot.py). Won, lost or still
+        # playing follows from these and the board, as it did when saved.
+        self.score = score
+        self.pairs_found = pairs_found
+        self.time_left = time_left
+        self.selected = [tuple(cell) for cell in selected]
+        self._check_end()
+        return self.state
+
+    def _check_end(self):
+        # End when time runs out OR all target pairs are found, and (for
+        # missions that say so) as soon as no valid pair is left
+        if self.pairs_found >= self.target_pairs:
+            self.state = COMPLETE
+        elif self.end_when_stuck and not self.board.has_pairs():
+            self.state = NO_MORE_PAIRS
+        elif self.time_left <= 0:
+            self.state = TIME_UP
@@ -1,18 +1,35 @@
+import argparse
 import pygame
 import sys
 import random
 import time
 import os
+import threading
+from collections import deque
 
-# Initialize pygame
-pygame.init()
-pygame.mixer.init()
+import assetcache
+import audio
+import campaign
+import engine
+import gameclock
+import rendertarget
+import replay
+import scores
+import snapshot
+from effects import EffectScheduler, HighlightEffect, MessageEffect
+from profiler import FrameProfiler
+import solver
+from textcache import render_text, text_cache
+from viewport import Viewport, ZOOM_STEP
+from engine import GRID_SIZE, TIME_PER_LEVEL, TOTAL_PAIRS_PER_LEVEL, MAX_SCORE_PER_LEVEL
 
-# Screen dimensions
+# Screen dimensions: the logical resolution every screen is laid out in.
+# `screen` is the render target at this size; render_target scales it to
+# whatever size the window is.
 SCREEN_WIDTH = 900
 SCREEN_HEIGHT = 700
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Space Number Match")
+screen = None
+render_target = None
 
 # Space theme colors
 DARK_SPACE = (5, 5, 20)
@@ -31,22 +48,7 @@ WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 GOLD = (255, 215, 0)
 
-# Fonts
-try:
-    title_font = pygame.font.Font(None, 64)
-    header_font = pygame.font.Font(None, 40)
-    button_font = pygame.font.Font(None, 32)
-    cell_font = pygame.font.Font(None, 36)
-    small_font = pygame.font.Font(None, 24)
-except:
-    title_font = pygame.font.SysFont('arial', 64, bold=True)
-    header_font = pygame.font.SysFont('arial', 40, bold=True)
-    button_font = pygame.font.SysFont('arial', 32)
-    cell_font = pygame.font.SysFont('arial', 36, bold=True)
-    small_font = pygame.font.SysFont('arial', 24)
-
-# Game constants
-GRID_SIZE = 5
+# Layout constants
 CELL_SIZE = 80
 GRID_WIDTH = GRID_SIZE * CELL_SIZE
 GRID_HEIGHT = GRID_SIZE * CELL_SIZE
@@ -54,26 +56,33 @@ GRID_HEIGHT = GRID_SIZE * CELL_SIZE
 GRID_MARGIN_X = (SCREEN_WIDTH - GRID_WIDTH) // 2
 GRID_MARGIN_Y = (SCREEN_HEIGHT - GRID_HEIGHT) // 2
 GRID_TOP = 180  # Keep this for vertical positioning
-TIME_PER_LEVEL = 120
-MAX_SCORE_FILE = "max_score.txt"
-TOTAL_PAIRS_PER_LEVEL = 10
-MAX_SCORE_PER_LEVEL = TOTAL_PAIRS_PER_LEVEL * 5
+# Screen region a large board's scrollable viewport may use
+GRID_AREA = (20, GRID_TOP, SCREEN_WIDTH - 40, SCREEN_HEIGHT - GRID_TOP - 20)
+FPS = 60
+MENU_WAIT_MS = 500  # menus wake at least this often while idle
 
-# Load assets
+# Fonts (created by init_pygame)
+title_font = None
+header_font = None
+button_font = None
+cell_font = None
+small_font = None
+
+# Load assets: background images, and the sound effects into the audio
+# engine's cache. Decoding happens on a worker thread (through the on-disk
+# asset cache) while the start screen is already up; until then each image
+# is None and the screens fall back to the starfield.
 def load_assets():
     assets = {
         'start_bg': None,
-        'game_over_bg': None,
-        'bg_music': None,
-        'game_over_sound': None
+        'game_over_bg': None
     }
     
     # Try to load images
     for img_file in ['game_start.jpeg', 'game_start.jpg', 'game_start.png']:
         if os.path.exists(img_file):
             try:
-                assets['start_bg'] = pygame.image.load(img_file)
-                assets['start_bg'] = pygame.transform.scale(assets['start_bg'], (SCREEN_WIDTH, SCREEN_HEIGHT))
+                assets['start_bg'] = assetcache.load_image(img_file, (SCREEN_WIDTH, SCREEN_HEIGHT))
                 break
             except:
                 pass
@@ -81,47 +90,92 @@ def load_assets():
     for img_file in ['game_over.jpeg', 'game_over.jpg', 'game_over.png']:
         if os.path.exists(img_file):
             try:
-                assets['game_over_bg'] = pygame.image.load(img_file)
-                assets['game_over_bg'] = pygame.transform.scale(assets['game_over_bg'], (SCREEN_WIDTH, SCREEN_HEIGHT))
+                assets['game_over_bg'] = assetcache.load_image(img_file, (SCREEN_WIDTH, SCREEN_HEIGHT))
                 break
             except:
                 pass
     
-    # Load sounds
-    if os.path.exists('music.mp3'):
-        try:
-            assets['bg_music'] = 'music.mp3'
-            pygame.mixer.music.load('music.mp3')
-        except:
-            pass
-    
-    if os.path.exists('game_over.mp3'):
-        try:
-            assets['game_over_sound'] = pygame.mixer.Sound('game_over.mp3')
-        except:
-            pass
+    # Decode sound effects once, so the first click doesn't
+    if audio_engine is not None:
+        audio_engine.preload()
     
     return assets
 
-assets = load_assets()
+assets = {}
+audio_engine = None  # audio.AudioEngine, created by init_pygame
+asset_thread = None
+ASSETS_READY = pygame.event.custom_type()  # posted by the loader thread
 
-if assets['bg_music']:
-    pygame.mixer.music.play(-1)
-    pygame.mixer.music.set_volume(0.2)
+def _load_assets_worker():
+    pygame.event.post(pygame.event.Event(ASSETS_READY, assets=load_assets()))
 
-# Score handling
-def load_max_score():
-    if os.path.exists(MAX_SCORE_FILE):
-        with open(MAX_SCORE_FILE, 'r') as f:
-            try:
-                return int(f.read())
-            except:
-                return 0
-    return 0
+def start_asset_loading():
+    global asset_thread
+    asset_thread = threading.Thread(target=_load_assets_worker, name="asset-loader", daemon=True)
+    asset_thread.start()
+
+def handle_assets_ready(event):
+    # On the main thread: swap the placeholders for the loaded assets
+    if event.type != ASSETS_READY:
+        return False
+    for name, value in event.assets.items():
+        if isinstance(value, pygame.Surface):
+            value = value.convert()
+        assets[name] = value
+    return True
+
+def handle_window_event(event):
+    # On the main thread: follow the window to a new size. Callers repaint
+    # or re-present afterwards.
+    global screen
+    if event.type != pygame.VIDEORESIZE or render_target.flags & pygame.FULLSCREEN:
+        return False
+    screen = render_target.resize(event.size)
+    return True
+
+def wait_for_assets(timeout=None):
+    if asset_thread is not None:
+        asset_thread.join(timeout)
+    for event in pygame.event.get(ASSETS_READY):
+        handle_assets_ready(event)
+clock = None  # the single frame-pacing clock, created by init_pygame
+
+# Window, fonts, assets and music are set up here rather than at import time,
+# so importing this module (or engine) costs nothing in headless workers.
+def init_pygame(window_size=None, display_mode=rendertarget.DISPLAY_MODE, fullscreen=False):
+    global screen, clock, render_target, audio_engine
+    global title_font, header_font, button_font, cell_font, small_font
 
-def save_max_score(score):
-    with open(MAX_SCORE_FILE, 'w') as f:
-        f.write(str(score))
+    # A small mixer buffer keeps sound effects within a frame of the click
+    pygame.mixer.pre_init(audio.AUDIO_FREQUENCY, -16, 2, audio.AUDIO_BUFFER)
+    pygame.init()
+    pygame.mixer.init()
+    audio_engine = audio.AudioEngine()
+
+    render_target = rendertarget.RenderTarget((SCREEN_WIDTH, SCREEN_HEIGHT), window_size,
+                                              display_mode, fullscreen)
+    screen = render_target.target
+    pygame.display.set_caption("Space Number Match")
+    clock = pygame.time.Clock()
+
+    try:
+        title_font = pygame.font.Font(None, 64)
+        header_font = pygame.font.Font(None, 40)
+        button_font = pygame.font.Font(None, 32)
+        cell_font = pygame.font.Font(None, 36)
+        small_font = pygame.font.Font(None, 24)
+    except:
+        title_font = pygame.font.SysFont('arial', 64, bold=True)
+        header_font = pygame.font.SysFont('arial', 40, bold=True)
+        button_font = pygame.font.SysFont('arial', 32)
+        cell_font = pygame.font.SysFont('arial', 36, bold=True)
+        small_font = pygame.font.SysFont('arial', 24)
+
+    assets.update(start_bg=None, game_over_bg=None)
+    start_asset_loading()
+
+    # Music is streamed from disk, so opening it is cheap enough for startup
+    audio_engine.start_music()
 
 # Clean minimalist button
 class Button:
@@ -145,7 +199,7 @@ class Button:
         pygame.draw.rect(surface, STAR_WHITE, self.rect, 2, border_radius=6)
         
         # Text
-        text_surf = button_font.render(self.text, True, WHITE)
+        text_surf = render_text(button_font, self.text, True, WHITE)
         text_rect = text_surf.get_rect(center=self.rect.center)
         surface.blit(text_surf, text_rect)
     
@@ -163,172 +217,232 @@ class Button:
                 return True
         return False
 
-# Clean grid cell
+# Space-themed colors for numbers
+CELL_COLORS = [
+    STAR_BLUE, PLANET_PURPLE, SPACESHIP_ORANGE, NEBULA_TEAL,
+    ALIEN_GREEN, GALAXY_PINK, GRID_BLUE, GOLD, ASTEROID_GRAY
+]
+
+# Pre-rendered cell tiles keyed by (number, highlighted, cell size).
+# The atlas is dropped and rebuilt lazily when CELL_SIZE, the palette or the
+# cell font changes, so drawing a cell is a single blit.
+_tile_atlas = {}
+_tile_atlas_key = None
+
+# Zoomed tiles need a number font scaled to the cell
+_cell_fonts = {}
+
+def get_cell_font(size):
+    if size == CELL_SIZE:
+        return cell_font
+    font = _cell_fonts.get(size)
+    if font is None:
+        font = pygame.font.Font(None, max(10, 36 * size // CELL_SIZE))
+        _cell_fonts[size] = font
+    return font
+
+def render_cell_tile(number, highlighted, size):
+    color = CELL_COLORS[(number - 1) % len(CELL_COLORS)]
+    
+    # Clean cell design
+    tile = pygame.Surface((size, size), pygame.SRCALPHA)
+    
+    # Main cell with slight gradient
+    pygame.draw.rect(tile, color, (2, 2, size-4, size-4), border_radius=8)
+    
+    # Highlight border if selected
+    border_color = GOLD if highlighted else STAR_WHITE
+    border_width = 3 if highlighted else 1
+    pygame.draw.rect(tile, border_color, (0, 0, size, size), border_width, border_radius=10)
+    
+    # Number (centered properly)
+    num_text = render_text(get_cell_font(size), str(number), True, WHITE)
+    text_rect = num_text.get_rect(center=(size//2, size//2))
+    tile.blit(num_text, text_rect)
+    
+    return tile
+
+def get_cell_tile(number, highlighted, size=None):
+    global _tile_atlas_key
+    if size is None:
+        size = CELL_SIZE
+    atlas_key = (CELL_SIZE, tuple(CELL_COLORS), cell_font)
+    if atlas_key != _tile_atlas_key:
+        _tile_atlas.clear()
+        _tile_atlas_key = atlas_key
+    
+    key = (number, highlighted, size)
+    tile = _tile_atlas.get(key)
+    if tile is None:
+        tile = render_cell_tile(number, highlighted, size)
+        _tile_atlas[key] = tile
+    return tile
+
+# Clean grid cell: a lightweight pygame view onto one engine.Board cell.
+# Number and visibility live in the board's byte arrays, colours and tiles
+# are shared, and the position is derived from the layout on demand, so a
+# view costs a few slots and can be made whenever one is needed.
 class Cell:
-    def __init__(self, row, col, number):
+    __slots__ = ('board', 'row', 'col', 'highlighted')
+
+    def __init__(self, board, row, col):
+        self.board = board
         self.row = row
         self.col = col
-        self.number = number
-        # CENTERED GRID: Use GRID_MARGIN_X for horizontal centering
-        self.x = GRID_MARGIN_X + col * CELL_SIZE
-        self.y = GRID_TOP + row * CELL_SIZE  # Keep vertical position from top
-        self.rect = pygame.Rect(self.x, self.y, CELL_SIZE, CELL_SIZE)
-        self.visible = True
         self.highlighted = False
-        
-        # Space-themed colors for numbers
-        self.colors = [
-            STAR_BLUE, PLANET_PURPLE, SPACESHIP_ORANGE, NEBULA_TEAL,
-            ALIEN_GREEN, GALAXY_PINK, GRID_BLUE, GOLD, ASTEROID_GRAY
-        ]
-        self.color = self.colors[(number - 1) % len(self.colors)]
+    
+    # CENTERED GRID: Use GRID_MARGIN_X for horizontal centering
+    @property
+    def x(self):
+        return GRID_MARGIN_X + self.col * CELL_SIZE
+    
+    @property
+    def y(self):
+        return GRID_TOP + self.row * CELL_SIZE  # Keep vertical position from top
+    
+    @property
+    def rect(self):
+        return pygame.Rect(self.x, self.y, CELL_SIZE, CELL_SIZE)
+    
+    @property
+    def number(self):
+        return self.board.number(self.row, self.col)
+    
+    @property
+    def visible(self):
+        return self.board.is_visible(self.row, self.col)
     
     def draw(self, surface):
         if not self.visible:
             return
+        surface.blit(get_cell_tile(self.number, self.highlighted), (self.x, self.y))
+    
+    def is_clicked(self, pos):
+        return self.rect.collidepoint(pos) and self.visible
+
+# Build the drawable grid of Cells over an engine board
+def build_grid(board):
+    return [[Cell(board, r, c) for c in range(board.cols)] for r in range(board.rows)]
+
+# A drawable grid over a fresh board with the engine's default pairs and rule
+def generate_grid(rows, cols):
+    return build_grid(engine.generate_board(rows, cols))
+
+# Space background, rendered once with a fixed seed and then only blitted.
+# A small twinkle layer redraws a few stars per frame within a time budget.
+STARFIELD_SEED = 7
+STAR_COUNT = 100
+TWINKLE_STARS_PER_FRAME = 4
+TWINKLE_BUDGET = 0.0005  # seconds per frame
+
+class Starfield:
+    def __init__(self, width, height, seed=STARFIELD_SEED, twinkle=True):
+        self.rng = random.Random(seed)
+        self.twinkle = twinkle
+        self.planets = [
+            ((40, 40, 100), (width - 100, 100), 50),
+            ((100, 40, 100), (100, height - 100), 30),
+        ]
         
-        # Clean cell design
-        cell_surf = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
+        # Dark space gradient
+        self.sky = pygame.Surface((width, height))
+        self.sky.fill(DARK_SPACE)
         
-        # Main cell with slight gradient
-        pygame.draw.rect(cell_surf, self.color, (2, 2, CELL_SIZE-4, CELL_SIZE-4), border_radius=8)
+        # Stars (those under a planet never twinkle, the planet covers them)
+        self.stars = []
+        self.twinkling = []
+        for _ in range(STAR_COUNT):
+            x = self.rng.randint(0, width)
+            y = self.rng.randint(0, height)
+            size = self.rng.randint(1, 2)
+            brightness = self.rng.randint(150, 255)
+            self.stars.append((x, y, size, brightness))
+            if not any((x - px) ** 2 + (y - py) ** 2 <= (r + size) ** 2
+                       for _, (px, py), r in self.planets):
+                self.twinkling.append(len(self.stars) - 1)
         
-        # Highlight border if selected
-        border_color = GOLD if self.highlighted else STAR_WHITE
-        border_width = 3 if self.highlighted else 1
-        pygame.draw.rect(cell_surf, border_color, (0, 0, CELL_SIZE, CELL_SIZE), border_width, border_radius=10)
+        self.surface = self.sky.copy()
+        for x, y, size, brightness in self.stars:
+            pygame.draw.circle(self.surface, (brightness, brightness, brightness), (x, y), size)
         
-        # Number (centered properly)
-        num_text = cell_font.render(str(self.number), True, WHITE)
-        text_rect = num_text.get_rect(center=(CELL_SIZE//2, CELL_SIZE//2))
-        cell_surf.blit(num_text, text_rect)
+        # Distant planets
+        for color, center, radius in self.planets:
+            pygame.draw.circle(self.surface, color, center, radius)
         
-        surface.blit(cell_surf, (self.x, self.y))
+        # Match the display format so the per-frame blit is a plain copy
+        if pygame.display.get_surface() is not None:
+            self.sky = self.sky.convert()
+            self.surface = self.surface.convert()
+        
+        self.next_star = 0
     
-    def is_clicked(self, pos):
-        return self.rect.collidepoint(pos) and self.visible
-
-# Generate grid with 10 pairs + 5 extras
-def generate_grid(rows, cols):
-    numbers = []
-    
-    # 10 pairs
-    for _ in range(TOTAL_PAIRS_PER_LEVEL):
-        num = random.randint(1, 9)
-        numbers.append(num)
-        numbers.append(num)
-    
-    # 5 extras for 5x5 grid
-    for _ in range(rows * cols - len(numbers)):
-        numbers.append(random.randint(1, 9))
-    
-    random.shuffle(numbers)
-    
-    grid = []
-    idx = 0
-    for r in range(rows):
-        row_cells = []
-        for c in range(cols):
-            row_cells.append(Cell(r, c, numbers[idx]))
-            idx += 1
-        grid.append(row_cells)
-    
-    return grid
-
-# Find pairs
-def find_identical_pairs(grid):
-    pairs = []
-    positions = []
-    for r in range(len(grid)):
-        for c in range(len(grid[0])):
-            if not grid[r][c].visible:
+    def update(self, exclude=()):
+        # Returns the screen rects that changed this frame. Stars under any
+        # of the `exclude` rects are left alone (something is drawn over them).
+        if not self.twinkle or not self.twinkling:
+            return []
+        dirty = []
+        deadline = time.perf_counter() + TWINKLE_BUDGET
+        for _ in range(TWINKLE_STARS_PER_FRAME):
+            if time.perf_counter() > deadline:
+                break
+            i = self.twinkling[self.next_star]
+            self.next_star = (self.next_star + 1) % len(self.twinkling)
+            x, y, size, _ = self.stars[i]
+            brightness = self.rng.randint(150, 255)
+            rect = pygame.Rect(x - size, y - size, size * 2 + 1, size * 2 + 1)
+            if rect.collidelist(exclude) != -1:
                 continue
-            num = grid[r][c].number
-            for rr in range(r, len(grid)):
-                start_col = c + 1 if rr == r else 0
-                for cc in range(start_col, len(grid[0])):
-                    if grid[rr][cc].visible and grid[rr][cc].number == num:
-                        pairs.append((num, num))
-                        positions.append([(r, c), (rr, cc)])
-    return pairs, positions
-
-def find_sum_pairs(grid, target=7):
-    pairs = []
-    positions = []
-    cells = []
-    for r in range(len(grid)):
-        for c in range(len(grid[0])):
-            if grid[r][c].visible:
-                cells.append((r, c, grid[r][c].number))
-    
-    for i in range(len(cells)):
-        r1, c1, n1 = cells[i]
-        for j in range(i + 1, len(cells)):
-            r2, c2, n2 = cells[j]
-            if n1 + n2 == target:
-                pairs.append((n1, n2))
-                positions.append([(r1, c1), (r2, c2)])
-    return pairs, positions
-
-# NEW FUNCTION: Check if any sum-to-7 pairs exist
-def can_continue_level2(grid):
-    """Check if there are any possible sum-to-7 pairs left"""
-    visible_numbers = []
-    for row in grid:
-        for cell in row:
-            if cell.visible:
-                visible_numbers.append(cell.number)
+            self.surface.blit(self.sky, rect, rect)
+            pygame.draw.circle(self.surface, (brightness, brightness, brightness), (x, y), size)
+            dirty.append(rect)
+        return dirty
     
-    # Check if any two visible numbers can sum to 7
-    for i in range(len(visible_numbers)):
-        for j in range(i + 1, len(visible_numbers)):
-            if visible_numbers[i] + visible_numbers[j] == 7:
-                return True
-    return False
+    def draw(self, surface):
+        surface.blit(self.surface, (0, 0))
+
+_starfield = None
+
+def get_starfield():
+    global _starfield
+    if _starfield is None or _starfield.surface.get_size() != screen.get_size():
+        _starfield = Starfield(*screen.get_size())
+    return _starfield
 
 # Draw space background
 def draw_space_background():
-    # Dark space gradient
-    screen.fill(DARK_SPACE)
-    
-    # Stars
-    for _ in range(100):
-        x = random.randint(0, SCREEN_WIDTH)
-        y = random.randint(0, SCREEN_HEIGHT)
-        size = random.randint(1, 2)
-        brightness = random.randint(150, 255)
-        pygame.draw.circle(screen, (brightness, brightness, brightness), (x, y), size)
-    
-    # Distant planets
-    pygame.draw.circle(screen, (40, 40, 100), (SCREEN_WIDTH - 100, 100), 50)
-    pygame.draw.circle(screen, (100, 40, 100), (100, SCREEN_HEIGHT - 100), 30)
+    starfield = get_starfield()
+    starfield.update()
+    starfield.draw(screen)
 
 def draw_grid(grid):
     for row in grid:
         for cell in row:
             cell.draw(screen)
 
-def draw_game_info(level, score, time_left, target_text, pairs_found):
+def draw_game_info(level, score, time_left, target_text, pairs_found,
+                   target_pairs=TOTAL_PAIRS_PER_LEVEL, max_score=MAX_SCORE_PER_LEVEL,
+                   time_limit=TIME_PER_LEVEL):
     # Info panel
     panel = pygame.Rect(0, 0, SCREEN_WIDTH, 140)
     pygame.draw.rect(screen, DEEP_SPACE, panel)
     pygame.draw.line(screen, STAR_BLUE, (0, 140), (SCREEN_WIDTH, 140), 2)
     
     # Left column: Level and Score
-    level_text = header_font.render(f"MISSION {level}", True, STAR_WHITE)
-    score_text = small_font.render(f"SCORE: {score}/50", True, GOLD)
-    pairs_text = small_font.render(f"PAIRS: {pairs_found}/10", True, ALIEN_GREEN)
+    level_text = render_text(header_font, f"MISSION {level}", True, STAR_WHITE)
+    score_text = render_text(small_font, f"SCORE: {score}/{max_score}", True, GOLD)
+    pairs_text = render_text(small_font, f"PAIRS: {pairs_found}/{target_pairs}", True, ALIEN_GREEN)
     
     screen.blit(level_text, (50, 30))
     screen.blit(score_text, (50, 75))
     screen.blit(pairs_text, (50, 100))
     
     # Center: Mission objective
-    target_surf = header_font.render(target_text, True, NEBULA_TEAL)
+    target_surf = render_text(header_font, target_text, True, NEBULA_TEAL)
     screen.blit(target_surf, (SCREEN_WIDTH // 2 - target_surf.get_width() // 2, 75))
     
     # Right column: Timer
-    time_text = header_font.render(f"TIME: {int(time_left)}s", True, STAR_WHITE)
+    time_text = render_text(header_font, f"TIME: {int(time_left)}s", True, STAR_WHITE)
     screen.blit(time_text, (SCREEN_WIDTH - 150, 30))
     
     # Timer bar
@@ -341,25 +455,79 @@ def draw_game_info(level, score, time_left, target_text, pairs_found):
     pygame.draw.rect(screen, (50, 50, 50), (bar_x, bar_y, bar_width, bar_height))
     
     # Progress bar
-    progress = time_left / TIME_PER_LEVEL
+    progress = time_left / time_limit
     bar_color = ALIEN_GREEN if progress > 0.3 else SPACESHIP_ORANGE if progress > 0.1 else WARNING_RED
     pygame.draw.rect(screen, bar_color, (bar_x, bar_y, bar_width * progress, bar_height))
 
-def draw_selection_info(selected):
-    if len(selected) == 1:
-        cell = selected[0]
-        text = small_font.render(f"Selected: {cell.number}", True, NEBULA_TEAL)
+def draw_selection_info(selected_numbers):
+    if len(selected_numbers) == 1:
+        text = render_text(small_font, f"Selected: {selected_numbers[0]}", True, NEBULA_TEAL)
         screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, 120))
 
-def display_message(text, color=NEBULA_TEAL, duration=1):
-    # Simple message display
-    msg_surf = header_font.render(text, True, color)
-    msg_rect = msg_surf.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-    screen.blit(msg_surf, msg_rect)
-    pygame.display.flip()
-    time.sleep(duration)
+def display_message(effects, text, now, color=NEBULA_TEAL, duration=1):
+    # Message overlay that fades over the live game instead of blocking it.
+    # `now` is game time, the effect scheduler's time base.
+    msg_surf = render_text(header_font, text, True, color)
+    effect = MessageEffect(msg_surf, (SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2), now, duration)
+    return effects.add(effect)
+
+# Event-driven menu loop: blocks in pygame.event.wait instead of spinning,
+# and repaints a button only when its hover state changes. Returns the
+# button that was clicked. `redraw` repaints the screen behind the buttons
+# when background assets finish loading.
+def run_menu(buttons, redraw=None):
+    def paint():
+        # What lies under each button (and its hover glow), for repainting
+        backdrops = []
+        for button in buttons:
+            area = button.rect.inflate(8, 8).clip(screen.get_rect())
+            backdrops.append((area, screen.subsurface(area).copy()))
+        
+        mouse_pos = render_target.mouse_pos()
+        for button in buttons:
+            button.is_hovered(mouse_pos)
+            button.draw(screen)
+        render_target.present()
+        return backdrops
+    
+    backdrops = paint()
+    while True:
+        events = [pygame.event.wait(MENU_WAIT_MS)] + pygame.event.get()
+        changed = []
+        for event in events:
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            render_target.map_event(event)
+            audio_engine.handle_event(event)
+            resized = handle_window_event(event)
+            if (handle_assets_ready(event) or resized) and redraw:
+                redraw()
+                backdrops = paint()
+                changed = []
+            elif resized:
+                # The target kept its picture; it only needs scaling again
+                render_target.present()
+            if event.type == pygame.MOUSEMOTION:
+                for i, button in enumerate(buttons):
+                    was_hovered = button.current_color == button.hover_color
+                    if button.is_hovered(event.pos) != was_hovered and i not in changed:
+                        changed.append(i)
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                for button in buttons:
+                    if button.is_clicked(event.pos, event):
+                        return button
+        
+        if changed:
+            rects = []
+            for i in changed:
+                area, backdrop = backdrops[i]
+                screen.blit(backdrop, area)
+                buttons[i].draw(screen)
+                rects.append(area)
+            render_target.present(rects)
 
-def level_screen(level, score, time_taken):
+def level_screen(level, score, time_taken, max_score=MAX_SCORE_PER_LEVEL, last=False):
     draw_space_background()
     
     # Mission complete panel
@@ -367,40 +535,34 @@ def level_screen(level, score, time_taken):
     pygame.draw.rect(screen, DEEP_SPACE, panel, border_radius=10)
     pygame.draw.rect(screen, STAR_BLUE, panel, 3, border_radius=10)
     
-    title = title_font.render(f"MISSION {level} COMPLETE", True, GOLD)
-    score_text = header_font.render(f"Points: {score}/50", True, STAR_WHITE)
-    time_text = header_font.render(f"Time: {int(time_taken)}s", True, NEBULA_TEAL)
+    title = render_text(title_font, f"MISSION {level} COMPLETE", True, GOLD)
+    score_text = render_text(header_font, f"Points: {score}/{max_score}", True, STAR_WHITE)
+    time_text = render_text(header_font, f"Time: {int(time_taken)}s", True, NEBULA_TEAL)
     
     screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 200))
     screen.blit(score_text, (SCREEN_WIDTH // 2 - score_text.get_width() // 2, 280))
     screen.blit(time_text, (SCREEN_WIDTH // 2 - time_text.get_width() // 2, 330))
     
-    if level == 1:
-        btn_text = "CONTINUE"
-    else:
-        btn_text = "VIEW MISSION REPORT"
+    btn_text = "VIEW MISSION REPORT" if last else "CONTINUE"
     
     continue_btn = Button(SCREEN_WIDTH // 2 - 120, 420, 240, 50, btn_text)
-    
-    running = True
-    while running:
-        mouse_pos = pygame.mouse.get_pos()
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if continue_btn.is_clicked(mouse_pos, event):
-                return
-        
-        continue_btn.is_hovered(mouse_pos)
-        continue_btn.draw(screen)
-        pygame.display.flip()
+    run_menu([continue_btn])
 
-def game_over_screen(total_score, total_time, max_score):
-    if assets.get('game_over_sound'):
-        pygame.mixer.music.stop()
-        assets['game_over_sound'].play()
+def game_over_screen(total_score, total_time, max_score, campaign_max=2 * MAX_SCORE_PER_LEVEL):
+    # The music keeps playing, faded down under the game-over jingle
+    audio_engine.crossfade_to('game_over')
+    
+    draw_game_over_screen(total_score, total_time, max_score, campaign_max)
+    restart_btn = Button(SCREEN_WIDTH // 2 - 160, 400, 150, 50, "NEW GAME")
+    quit_btn = Button(SCREEN_WIDTH // 2 + 10, 400, 150, 50, "EXIT", WARNING_RED, SPACESHIP_ORANGE)
     
+    redraw = lambda: draw_game_over_screen(total_score, total_time, max_score, campaign_max)
+    if run_menu([restart_btn, quit_btn], redraw) is restart_btn:
+        audio_engine.restore_music()
+        return True
+    return False
+
+def draw_game_over_screen(total_score, total_time, max_score, campaign_max):
     # Draw background
     if assets.get('game_over_bg'):
         screen.blit(assets['game_over_bg'], (0, 0))
@@ -412,42 +574,32 @@ def game_over_screen(total_score, total_time, max_score):
     pygame.draw.rect(screen, DEEP_SPACE, panel, border_radius=10)
     pygame.draw.rect(screen, STAR_BLUE, panel, 3, border_radius=10)
     
-    title = title_font.render("MISSION REPORT", True, GOLD)
-    total_score_text = header_font.render(f"Total Points: {total_score}/100", True, STAR_WHITE)
-    total_time_text = header_font.render(f"Mission Duration: {int(total_time)}s", True, NEBULA_TEAL)
-    max_score_text = header_font.render(f"High Score: {max_score}", True, ALIEN_GREEN)
+    title = render_text(title_font, "MISSION REPORT", True, GOLD)
+    total_score_text = render_text(header_font, f"Total Points: {total_score}/{campaign_max}", True, STAR_WHITE)
+    total_time_text = render_text(header_font, f"Mission Duration: {int(total_time)}s", True, NEBULA_TEAL)
+    max_score_text = render_text(header_font, f"High Score: {max_score}", True, ALIEN_GREEN)
     
     screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 150))
     screen.blit(total_score_text, (SCREEN_WIDTH // 2 - total_score_text.get_width() // 2, 230))
     screen.blit(total_time_text, (SCREEN_WIDTH // 2 - total_time_text.get_width() // 2, 280))
     screen.blit(max_score_text, (SCREEN_WIDTH // 2 - max_score_text.get_width() // 2, 330))
-    
-    restart_btn = Button(SCREEN_WIDTH // 2 - 160, 400, 150, 50, "NEW GAME")
-    quit_btn = Button(SCREEN_WIDTH // 2 + 10, 400, 150, 50, "EXIT", WARNING_RED, SPACESHIP_ORANGE)
-    
-    running = True
-    while running:
-        mouse_pos = pygame.mouse.get_pos()
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if restart_btn.is_clicked(mouse_pos, event):
-                if assets.get('bg_music'):
-                    pygame.mixer.music.play(-1)
-                return True
-            if quit_btn.is_clicked(mouse_pos, event):
-                return False
-        
-        restart_btn.is_hovered(mouse_pos)
-        quit_btn.is_hovered(mouse_pos)
-        restart_btn.draw(screen)
-        quit_btn.draw(screen)
-        pygame.display.flip()
 
-def start_screen():
-    max_score = load_max_score()
+def start_screen(max_score, missions=engine.DEFAULT_MISSIONS, can_resume=False):
+    # Returns True to resume the suspended mission, False for a new game
+    draw_start_screen(max_score, missions)
     
+    # Start button, next to a resume button when a mission was suspended
+    if can_resume:
+        start_btn = Button(SCREEN_WIDTH // 2 - 250, 530, 240, 60, "LAUNCH MISSION")
+        resume_btn = Button(SCREEN_WIDTH // 2 + 10, 530, 240, 60, "RESUME MISSION",
+                            NEBULA_TEAL, SPACESHIP_ORANGE)
+        buttons = [start_btn, resume_btn]
+    else:
+        start_btn = Button(SCREEN_WIDTH // 2 - 120, 530, 240, 60, "LAUNCH MISSION")
+        buttons = [start_btn]
+    return run_menu(buttons, lambda: draw_start_screen(max_score, missions)) is not start_btn
+
+def draw_start_screen(max_score, missions=engine.DEFAULT_MISSIONS):
     # Draw background
     if assets.get('start_bg'):
         screen.blit(assets['start_bg'], (0, 0))
@@ -459,8 +611,8 @@ def start_screen():
     pygame.draw.rect(screen, DEEP_SPACE, title_panel, border_radius=10)
     pygame.draw.rect(screen, STAR_BLUE, title_panel, 3, border_radius=10)
     
-    title1 = title_font.render("SPACE NUMBER", True, STAR_WHITE)
-    title2 = title_font.render("MATCH MISSION", True, NEBULA_TEAL)
+    title1 = render_text(title_font, "SPACE NUMBER", True, STAR_WHITE)
+    title2 = render_text(title_font, "MATCH MISSION", True, NEBULA_TEAL)
     
     screen.blit(title1, (SCREEN_WIDTH // 2 - title1.get_width() // 2, 80))
     screen.blit(title2, (SCREEN_WIDTH // 2 - title2.get_width() // 2, 150))
@@ -470,187 +622,481 @@ def start_screen():
     pygame.draw.rect(screen, DEEP_SPACE, instr_panel, border_radius=10)
     pygame.draw.rect(screen, GRID_BLUE, instr_panel, 2, border_radius=10)
     
-    instructions = [
-        "MISSION 1: Find 10 matching number pairs",
-        "MISSION 2: Find 10 pairs that sum to 7",
+    instructions = [f"MISSION {m.number}: Find {m.target_pairs} {m.rule.goal}" for m in missions]
+    all_missions = {1: "the mission", 2: "both missions"}.get(len(missions), f"all {len(missions)} missions")
+    instructions += [
         "Click two numbers to select them",
-        "Press SPACE to clear selection",
-        "Complete both missions before time runs out"
+        "Press SPACE to clear selection, P to pause",
+        f"Complete {all_missions} before time runs out"
     ]
     
+    # Long campaigns squeeze the lines to fit the panel
+    spacing = min(35, 190 // len(instructions))
     for i, instruction in enumerate(instructions):
-        instr_text = small_font.render(instruction, True, STAR_WHITE)
-        screen.blit(instr_text, (SCREEN_WIDTH // 2 - instr_text.get_width() // 2, 250 + i * 35))
+        instr_text = render_text(small_font, instruction, True, STAR_WHITE)
+        screen.blit(instr_text, (SCREEN_WIDTH // 2 - instr_text.get_width() // 2, 250 + i * spacing))
     
     # High score
     score_panel = pygame.Rect(SCREEN_WIDTH // 2 - 200, 460, 400, 50)
     pygame.draw.rect(screen, DEEP_SPACE, score_panel, border_radius=8)
     pygame.draw.rect(screen, GOLD, score_panel, 2, border_radius=8)
     
-    max_text = header_font.render(f"High Score: {max_score}/100", True, GOLD)
+    max_text = render_text(header_font, f"High Score: {max_score}/{campaign.max_score(missions)}", True, GOLD)
     screen.blit(max_text, (SCREEN_WIDTH // 2 - max_text.get_width() // 2, 475))
+
+# Retained-mode gameplay renderer. It remembers what was last drawn and
+# only redraws, and pushes to the display, the regions that changed: the info
+# panel when score/timer/selection change, touched cells and twinkling stars.
+# FULL_FRAME_RENDER falls back to redrawing everything and flipping.
+FULL_FRAME_RENDER = os.environ.get('SPACE_MATCH_FULL_FRAME') == '1'
+INFO_PANEL_HEIGHT = 142  # panel plus its 2px border line
+
+# Frame timing for play_level. F3 toggles the HUD, F4 exports the recorded
+# frames as CSV/JSON and F5 captures the next frames with cProfile.
+profiler = FrameProfiler()
+profiler_hud = False
+HUD_REFRESH_FRAMES = 15
+_hud_surf = None
+_hud_frame = -HUD_REFRESH_FRAMES
+
+def draw_profiler_hud():
+    global _hud_surf, _hud_frame
+    # Re-render the text a few times a second, not every frame
+    if _hud_surf is None or profiler.frame_count - _hud_frame >= HUD_REFRESH_FRAMES:
+        lines = profiler.overlay_lines() or ["collecting frames..."]
+        lines.append(text_cache.stats_line())
+        lines.append(audio_engine.stats_line())
+        line_surfs = [render_text(small_font, line, True, NEBULA_TEAL) for line in lines]
+        width = max(surf.get_width() for surf in line_surfs) + 16
+        _hud_surf = pygame.Surface((width, len(line_surfs) * 20 + 12), pygame.SRCALPHA)
+        _hud_surf.fill((*DARK_SPACE, 210))
+        for i, surf in enumerate(line_surfs):
+            _hud_surf.blit(surf, (8, 6 + i * 20))
+        _hud_frame = profiler.frame_count
+    rect = _hud_surf.get_rect(bottomleft=(10, SCREEN_HEIGHT - 10))
+    screen.blit(_hud_surf, rect)
+    return rect
+
+def make_viewport(board):
+    return Viewport(board.rows, board.cols, CELL_SIZE, GRID_AREA)
+
+class LevelRenderer:
+    def __init__(self, state, viewport, full_frame=FULL_FRAME_RENDER):
+        self.state = state
+        self.viewport = viewport
+        self.full_frame = full_frame
+        self.panel_rect = pygame.Rect(0, 0, SCREEN_WIDTH, INFO_PANEL_HEIGHT)
+        self.panel_key = None
+        self.touched = set()
+        self.needs_full = True
+        self.grid_dirty = False
+        self.effects = EffectScheduler()
+        self.overlay_rects = []
     
-    # Start button
-    start_btn = Button(SCREEN_WIDTH // 2 - 120, 530, 240, 60, "LAUNCH MISSION")
+    @property
+    def grid_rect(self):
+        return pygame.Rect(self.viewport.area)
     
-    running = True
-    while running:
-        mouse_pos = pygame.mouse.get_pos()
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if start_btn.is_clicked(mouse_pos, event):
-                return
-        
-        start_btn.is_hovered(mouse_pos)
-        start_btn.draw(screen)
-        pygame.display.flip()
-
-def count_pairs_found(grid, level):
-    visible_count = 0
-    for row in grid:
-        for cell in row:
-            if cell.visible:
-                visible_count += 1
-    
-    total_cells = len(grid) * len(grid[0])
-    cells_cleared = total_cells - visible_count
-    pairs_found = cells_cleared // 2
-    
-    return pairs_found
-
-def play_level(level, grid_rows, grid_cols):
-    grid = generate_grid(grid_rows, grid_cols)
-    score = 0
-    selected = []
-    level_start_time = time.time()
-    time_left = TIME_PER_LEVEL
-    pairs_found = 0
-    
-    if level == 1:
-        target_text = "FIND MATCHING NUMBER PAIRS"
-        check_pairs_func = find_identical_pairs
-    else:
-        target_text = "FIND PAIRS THAT SUM TO 7"
-        check_pairs_func = lambda g: find_sum_pairs(g, 7)
+    def invalidate(self):
+        # Something was drawn over the frame: repaint everything next time
+        self.needs_full = True
     
-    while True:
-        current_time = time.time()
-        elapsed = current_time - level_start_time
-        time_left = max(0, TIME_PER_LEVEL - elapsed)
+    def invalidate_grid(self):
+        # The viewport scrolled or zoomed: repaint the visible cells
+        self.grid_dirty = True
+    
+    def touch(self, row, col):
+        self.touched.add((row, col))
+    
+    def _repair(self, rect, starfield):
+        # Repaint whatever an overlay covered: background, panel and cells
+        screen.blit(starfield.surface, rect, rect)
+        if rect.colliderect(self.panel_rect):
+            self.panel_key = None
+        rows, cols = self.viewport.cells_in(rect)
+        for row in rows:
+            for col in cols:
+                self.touch(row, col)
+    
+    def _panel_key(self):
+        state = self.state
+        progress = state.time_left / state.time_limit
+        return (state.score, int(state.time_left), state.pairs_found,
+                int(progress * 200), self._selected_numbers())
+    
+    def _selected_numbers(self):
+        board = self.state.board
+        return tuple(board.number(row, col) for row, col in self.state.selected)
+    
+    def _draw_panel(self):
+        state = self.state
+        draw_game_info(state.level, state.score, state.time_left, state.target_text, state.pairs_found,
+                       state.target_pairs, state.target_pairs * state.points_per_pair, state.time_limit)
+        draw_selection_info(self._selected_numbers())
+    
+    def _draw_cells(self, rows, cols):
+        # Only cells inside the viewport are ever drawn, clipped to it
+        board = self.state.board
+        selected = self.state.selected
+        size = self.viewport.cell_size
+        screen.set_clip(self.grid_rect)
+        for row in rows:
+            base = row * board.cols
+            for col in cols:
+                if board.visible[base + col]:
+                    tile = get_cell_tile(board.numbers[base + col], (row, col) in selected, size)
+                    screen.blit(tile, self.viewport.cell_rect(row, col)[:2])
+        screen.set_clip(None)
+    
+    def draw(self, now):
+        starfield = get_starfield()
+        self.effects.expire(now)
+        
+        if self.full_frame or self.needs_full:
+            draw_space_background()
+            profiler.lap('background')
+            self._draw_panel()
+            profiler.lap('info')
+            self._draw_cells(*self.viewport.visible_cells())
+            profiler.lap('grid')
+            self.overlay_rects = self._draw_overlays(now)
+            profiler.lap('overlays')
+            render_target.present()
+            profiler.lap('flip')
+            self.panel_key = self._panel_key()
+            self.touched.clear()
+            self.needs_full = False
+            self.grid_dirty = False
+            return
         
-        pairs_found = count_pairs_found(grid, level)
+        # Overlays fade every frame, so last frame's overlay area is repaired
+        dirty = list(self.overlay_rects)
+        for rect in self.overlay_rects:
+            self._repair(rect, starfield)
         
-        # Level 1: End when time runs out OR all 10 pairs found
-        # Level 2: End when time runs out OR all 10 pairs found OR no more sum-to-7 pairs exist
-        if level == 1:
-            end_condition = (time_left <= 0 or pairs_found >= TOTAL_PAIRS_PER_LEVEL)
+        grid_rect = self.grid_rect
+        for rect in starfield.update(exclude=(self.panel_rect, grid_rect)):
+            screen.blit(starfield.surface, rect, rect)
+            dirty.append(rect)
+        profiler.lap('background')
+        
+        panel_key = self._panel_key()
+        if panel_key != self.panel_key:
+            self._draw_panel()
+            self.panel_key = panel_key
+            dirty.append(self.panel_rect)
+        profiler.lap('info')
+        
+        if self.grid_dirty:
+            screen.blit(starfield.surface, grid_rect, grid_rect)
+            self._draw_cells(*self.viewport.visible_cells())
+            dirty.append(grid_rect)
+            self.grid_dirty = False
         else:
-            # Level 2: Also check if any sum-to-7 pairs are possible
-            can_continue = can_continue_level2(grid)
-            end_condition = (time_left <= 0 or 
-                           pairs_found >= TOTAL_PAIRS_PER_LEVEL or 
-                           not can_continue)
+            for row, col in self.touched:
+                rect = grid_rect.clip(self.viewport.cell_rect(row, col))
+                if not rect.width or not rect.height:
+                    continue
+                screen.blit(starfield.surface, rect, rect)
+                self._draw_cells((row,), (col,))
+                dirty.append(rect)
+        self.touched.clear()
+        profiler.lap('grid')
         
-        if end_condition:
-            level_time = TIME_PER_LEVEL - time_left
-            # Show message if no more pairs possible (Level 2 only)
-            if level == 2 and not can_continue_level2(grid) and pairs_found < TOTAL_PAIRS_PER_LEVEL:
-                display_message("NO MORE VALID PAIRS", WARNING_RED, 1.5)
-            return score, level_time, grid
+        self.overlay_rects = self._draw_overlays(now)
+        dirty.extend(self.overlay_rects)
+        profiler.lap('overlays')
+        
+        if dirty:
+            render_target.present(dirty)
+        profiler.lap('flip')
+    
+    def _draw_overlays(self, now):
+        rects = self.effects.draw(screen, now)
+        if profiler_hud:
+            rects.append(draw_profiler_hud())
+        return rects
+
+def handle_profiler_key(key, effects, now):
+    global profiler_hud
+    if key == pygame.K_F3:
+        profiler_hud = not profiler_hud
+    elif key == pygame.K_F4:
+        profiler.export_csv()
+        profiler.export_json()
+        display_message(effects, "FRAME TRACE SAVED", now, NEBULA_TEAL, 1)
+    elif key == pygame.K_F5:
+        profiler.start_capture()
+        display_message(effects, "PROFILING...", now, NEBULA_TEAL, 1)
+
+HINT_DURATION = 1.5
+
+def show_hint(state, renderer, now):
+    # H key: pulse the best next pair, or say there is none
+    pair = solver.hint(state.board)
+    if pair is None:
+        display_message(renderer.effects, "NO PAIRS LEFT", now, WARNING_RED, 1)
+        return
+    viewport = renderer.viewport
+    if viewport.center_on(*pair[0]):
+        renderer.invalidate_grid()
+    for row, col in pair:
+        rect = pygame.Rect(viewport.cell_rect(row, col))
+        renderer.effects.add(HighlightEffect(rect, GOLD, now, HINT_DURATION))
+
+# Scrolling and zooming the viewport on large boards
+def handle_viewport_event(event, renderer):
+    viewport = renderer.viewport
+    area = viewport.area
+    step = viewport.cell_size
+    moved = False
+    if event.type == pygame.MOUSEWHEEL:
+        dx, dy = -event.x * step, -event.y * step
+        if pygame.key.get_mods() & pygame.KMOD_SHIFT:
+            dx, dy = dy, dx
+        moved = viewport.scroll(dx, dy)
+    elif event.type == pygame.KEYDOWN:
+        arrows = {
+            pygame.K_LEFT: (-step, 0), pygame.K_RIGHT: (step, 0),
+            pygame.K_UP: (0, -step), pygame.K_DOWN: (0, step),
+        }
+        if event.key in arrows:
+            moved = viewport.scroll(*arrows[event.key])
+        elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+            moved = viewport.zoom(ZOOM_STEP)
+        elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+            moved = viewport.zoom(1 / ZOOM_STEP)
+    if moved:
+        if viewport.area != area:
+            renderer.invalidate()
+        else:
+            renderer.invalidate_grid()
+
+def play_level(mission, grid_rows=None, grid_cols=None, session=None, resume=None, suspend=None):
+    # Play one engine.Mission, on its own board size unless one is given.
+    # Each board comes from its own seed; with a replay.Replay `session`,
+    # the seed and every select/clear are recorded so the level can be
+    # re-run exactly. `resume` is a snapshot.Snapshot to carry on from
+    # instead (a finished one returns at once); closing the window calls
+    # suspend(seed, state) first.
+    if resume is not None:
+        seed, state = resume.seed, resume.state
+        recording = None  # a replay has to start from the fresh board
+    else:
+        seed = random.getrandbits(64)
+        state = mission.make_level(random.Random(seed), grid_rows, grid_cols)
+        recording = session.start_level(seed, state) if session is not None else None
+    renderer = LevelRenderer(state, make_viewport(state.board))
+    
+    # Game time runs on its own clock (from where a resumed level left
+    # off) and the rules advance in fixed logic ticks, whatever the frame
+    # rate. Clicks and SPACE are queued with their game time and applied
+    # by the first tick at or after it.
+    game_clock = gameclock.GameClock(state.level_time)
+    logic = gameclock.FixedStep(state.level_time)
+    inputs = deque()  # (game time, (row, col) or None for SPACE)
+    
+    def apply_input(t, cell, now):
+        if cell is None:
+            for r, c in state.selected:
+                renderer.touch(r, c)
+            state.clear_selection()
+            if recording:
+                recording.clear(t)
+            return
+        for r, c in state.selected:
+            renderer.touch(r, c)
+        renderer.touch(*cell)
+        result = state.select(*cell)
+        if recording:
+            recording.select(t, *cell)
+            if result == engine.VALID_PAIR:
+                recording.checkpoint(t, state)
+        # Sounds go out in the same frame as the click
+        if result == engine.VALID_PAIR:
+            if state.pairs_found >= state.target_pairs:
+                audio_engine.play('complete')
+                display_message(renderer.effects, "MISSION COMPLETE!", now, GOLD, 1)
+            else:
+                audio_engine.play('valid')
+                display_message(renderer.effects, f"+{state.points_per_pair} POINTS", now,
+                                ALIEN_GREEN, 0.5)
+        elif result == engine.INVALID_PAIR:
+            audio_engine.play('invalid')
+            display_message(renderer.effects, "INVALID PAIR", now, WARNING_RED, 0.5)
+        elif result in (engine.SELECTED, engine.DESELECTED):
+            audio_engine.play('select')
+    
+    def finish(t, now):
+        # Missions that end when stuck say so
+        if state.state == engine.NO_MORE_PAIRS:
+            audio_engine.play('invalid')
+            display_message(renderer.effects, "NO MORE VALID PAIRS", now, WARNING_RED, 1.5)
+        if recording:
+            recording.end(t, state)
+    
+    while True:
+        profiler.begin_frame()
+        now = game_clock.now()
         
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                # Also once the level is won or lost but its closing message
+                # is still up: the result is kept and the run goes on from it
+                if suspend:
+                    suspend(seed, state)
                 pygame.quit()
                 sys.exit()
             
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                pos = pygame.mouse.get_pos()
-                for row in grid:
-                    for cell in row:
-                        if cell.is_clicked(pos):
-                            if cell in selected:
-                                selected.remove(cell)
-                                cell.highlighted = False
-                            else:
-                                if len(selected) < 2:
-                                    selected.append(cell)
-                                    cell.highlighted = True
+            render_target.map_event(event)
+            handle_assets_ready(event)
+            audio_engine.handle_event(event)
+            if handle_window_event(event):
+                renderer.invalidate()
             
-            if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
-                for cell in selected:
-                    cell.highlighted = False
-                selected.clear()
-        
-        # Check if two cells selected
-        if len(selected) == 2:
-            cell1, cell2 = selected
-            valid = False
+            # P pauses and resumes; losing focus pauses
+            pause = event.type == pygame.WINDOWFOCUSLOST and not game_clock.paused
+            if (pause or (event.type == pygame.KEYDOWN and event.key == pygame.K_p)) \
+                    and not state.finished:
+                if game_clock.toggle():
+                    display_message(renderer.effects, "PAUSED", now, NEBULA_TEAL, 1)
+                now = game_clock.now()
             
-            if level == 1:
-                valid = (cell1.number == cell2.number)
-            else:
-                valid = (cell1.number + cell2.number == 7)
+            if event.type in (pygame.MOUSEWHEEL, pygame.KEYDOWN):
+                handle_viewport_event(event, renderer)
             
-            if valid:
-                score += 5
-                cell1.visible = False
-                cell2.visible = False
-                
-                if pairs_found + 1 >= TOTAL_PAIRS_PER_LEVEL:
-                    display_message("MISSION COMPLETE!", GOLD, 1)
-                else:
-                    display_message("+5 POINTS", ALIEN_GREEN, 0.5)
-            else:
-                display_message("INVALID PAIR", WARNING_RED, 0.5)
+            if event.type == pygame.KEYDOWN:
+                handle_profiler_key(event.key, renderer.effects, now)
+            
+            if game_clock.paused:
+                continue
+            
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                cell = renderer.viewport.cell_at(event.pos)
+                if cell is not None:
+                    inputs.append((game_clock.now(), cell))
+            
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                inputs.append((game_clock.now(), None))
             
-            for cell in selected:
-                cell.highlighted = False
-            selected.clear()
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_h and not state.finished:
+                show_hint(state, renderer, now)
+        
+        profiler.lap('events')
+        
+        # Logic: every tick due by now, in order
+        if not state.finished:
+            for t in logic.advance(game_clock.now()):
+                state.tick(t)
+                while inputs and inputs[0][0] <= t:
+                    apply_input(t, inputs.popleft()[1], now)
+                if state.finished:
+                    finish(t, now)
+                    break
+        profiler.lap('rules')
+        
+        # The level is over once its closing messages have faded
+        if state.finished and not renderer.effects:
+            return state.score, state.level_time, state.board
         
         # Drawing
-        draw_space_background()
-        draw_game_info(level, score, time_left, target_text, pairs_found)
-        draw_selection_info(selected)
-        draw_grid(grid)
+        renderer.draw(now)
         
         # Grid border - CENTERED
         #border_rect = pygame.Rect(GRID_MARGIN_X - 5, GRID_TOP - 5,
         #                         GRID_WIDTH + 10, GRID_HEIGHT + 10)
         #pygame.draw.rect(screen, GRID_BLUE, border_rect, 3, border_radius=12)
         
-        pygame.display.flip()
-        pygame.time.Clock().tick(60)
+        clock.tick(FPS)
+        profiler.lap('wait')
+        profiler.end_frame()
 
-def main_game():
-    max_score = load_max_score()
+def main_game(grid_size=None, missions=engine.DEFAULT_MISSIONS):
+    # grid_size, if given, overrides every mission's board size.
+    # Every run goes to the score history; the writer keeps the best score
+    # in memory, so the UI thread never waits on the database
+    if grid_size is not None:
+        campaign.check_grid_size(missions, grid_size)
+    score_writer = scores.ScoreWriter()
+    campaign_max = campaign.max_score(missions)
     
     while True:
-        start_screen()
+        # A mission suspended by closing the window can be resumed once
+        suspended = snapshot.load_suspended(missions)
+        resume = start_screen(score_writer.best, missions, suspended is not None)
+        snapshot.discard()
+        session = replay.Replay()
         
-        # Mission 1
-        level1_score, level1_time, grid = play_level(1, GRID_SIZE, GRID_SIZE)
-        level_screen(1, level1_score, level1_time)
-        
-        # Mission 2
-        level2_score, level2_time, _ = play_level(2, len(grid), len(grid[0]))
+        # Missions in order, with a summary screen between them
+        results = []
+        run_grid_size = grid_size
+        first = 0
+        if resume:
+            results = suspended.results
+            run_grid_size = suspended.grid_size
+            first = suspended.mission_index
+            random.setstate(suspended.rng_state)
+        for i in range(first, len(missions)):
+            mission = missions[i]
+            suspend = lambda seed, state: snapshot.Snapshot(seed, state, i, run_grid_size,
+                                                            results).save()
+            score, level_time, _ = play_level(mission, run_grid_size, run_grid_size, session,
+                                              suspended if resume and i == first else None, suspend)
+            results.append((score, level_time))
+            if i < len(missions) - 1:
+                level_screen(mission.number, score, level_time, mission.max_score)
+        if session.levels:  # none when the run was resumed in its last mission
+            session.save(replay.replay_path())
         
         # Calculate totals
-        total_score = level1_score + level2_score
-        total_time = level1_time + level2_time
+        total_score = sum(score for score, _ in results)
+        total_time = sum(level_time for _, level_time in results)
         
-        # Update max score
-        if total_score > max_score:
-            max_score = total_score
-            save_max_score(max_score)
+        # Record the run
+        score_writer.submit(scores.make_run(results, run_grid_size or missions[0].rows))
         
         # Mission report
-        restart = game_over_screen(total_score, total_time, max_score)
+        restart = game_over_screen(total_score, total_time, score_writer.best, campaign_max)
         if not restart:
             break
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Space Number Match")
+    parser.add_argument('grid_size', type=int, nargs='?',
+                        help="board size for every mission, e.g. 200 for a scrollable 200x200")
+    parser.add_argument('--campaign', default=campaign.CAMPAIGN_FILE,
+                        help="mission spec file (default: %(default)s)")
+    parser.add_argument('--window', type=window_size, metavar='WxH',
+                        help="window size; the game is drawn at 900x700 and scaled to fit")
+    parser.add_argument('--display-mode', choices=rendertarget.MODES, default=rendertarget.DISPLAY_MODE,
+                        help="upscale filter when the window is not 900x700: 'performance' scales "
+                             "nearest-neighbour, cheaper than 'smooth' on slow hardware; drawing is "
+                             "900x700 either way (default: %(default)s)")
+    parser.add_argument('--fullscreen', action='store_true', help="fill the screen, letterboxed")
+    args = parser.parse_args()
+    # A bad campaign file, or a grid too small for it, is a usage error
+    # now rather than a crash once a mission starts
+    try:
+        if os.path.exists(args.campaign):
+            args.missions = campaign.load_campaign(args.campaign)
+        else:
+            args.missions = engine.DEFAULT_MISSIONS
+        if args.grid_size is not None:
+            campaign.check_grid_size(args.missions, args.grid_size)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+def window_size(text):
+    try:
+        width, height = (int(part) for part in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {text!r}")
+    return width, height
+
 if __name__ == "__main__":
-    main_game()
+    args = parse_args()
+    init_pygame(args.window, args.display_mode, args.fullscreen)
+    main_game(args.grid_size, args.missions)
     pygame.quit()
     sys.exit()
\ No newline at end of file
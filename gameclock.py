@@ -0,0 +1,76 @@
+import os
+import time
+
+# Game time, kept apart from wall time and from the frame rate.
+#
+# GameClock counts seconds of play on time.perf_counter (monotonic, high
+# resolution, unmoved by system clock changes) and stands still while
+# paused, so a pause costs no mission time. FixedStep turns clock readings
+# into logic ticks at LOGIC_RATE per second: the rules advance in the same
+# steps however fast, slowly or unevenly frames are drawn, and the ticks a
+# slow frame missed run at the start of the next one. Given a clock that is
+# not real time (ManualClock), the same loop runs headless as fast as the
+# CPU allows.
+
+LOGIC_RATE = int(os.environ.get('SPACE_MATCH_LOGIC_RATE', 120))  # ticks per second
+
+class GameClock:
+    def __init__(self, start=0.0, source=time.perf_counter):
+        self.source = source
+        self.base = start  # game time when the clock last started running
+        self.started = source()
+        self.paused = False
+
+    def now(self):
+        if self.paused:
+            return self.base
+        return self.base + (self.source() - self.started)
+
+    def pause(self):
+        if not self.paused:
+            self.base = self.now()
+            self.paused = True
+
+    def resume(self):
+        if self.paused:
+            self.started = self.source()
+            self.paused = False
+
+    def toggle(self):
+        if self.paused:
+            self.resume()
+        else:
+            self.pause()
+        return self.paused
+
+class ManualClock:
+    # A GameClock source that only moves when told to, for headless runs
+    def __init__(self, t=0.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+    def advance(self, seconds):
+        self.t += seconds
+
+class FixedStep:
+    def __init__(self, start=0.0, rate=LOGIC_RATE):
+        self.start = start
+        self.rate = rate
+        self.step = 1 / rate
+        self.ticks = 0  # ticks run so far
+
+    @property
+    def time(self):
+        # Game time of the last tick; computed from the count, so no drift
+        return self.start + self.ticks * self.step
+
+    def advance(self, now):
+        """Game times of the ticks due by `now`, oldest first"""
+        # Every tick runs, even after a long stall: a tick is cheap, and
+        # inputs then land on the same tick whatever the frame times were
+        due = int((now - self.start) * self.rate)
+        while self.ticks < due:
+            self.ticks += 1
+            yield self.time
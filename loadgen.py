@@ -0,0 +1,214 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import engine
+import server
+
+# Load generator for server.py: many concurrent sessions, each played by a
+# bot that clicks the first valid pair it sees (with a random miss now and
+# then) at human-like speed. Reports how many sessions one server core
+# carries (concurrent sessions / server CPU cores busy) and the move
+# latency (request to reply, as the client sees it).
+# First it checks that malformed requests get an error reply and leave
+# the connection open.
+#
+#   python loadgen.py --sessions 2000 --duration 30
+#
+# Without --host/--port/--unix it starts its own server on a Unix socket.
+
+SESSIONS_PER_CONNECTION = 50
+THINK_TIME = 0.75  # mean seconds between clicks, like bench.CLICK_INTERVAL
+MISS_RATE = 0.1    # chance a click is on a random cell
+
+class Client:
+    # One connection; requests carry an id so replies find their way back
+    # past the timer and end events the server pushes in between.
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.pending = {}
+        self.next_id = 1
+        self.ended = set()
+        self.errors = 0
+        self.task = asyncio.create_task(self._read())
+
+    @classmethod
+    async def connect(cls, host, port, unix):
+        if unix:
+            reader, writer = await asyncio.open_unix_connection(unix, limit=2 ** 20)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=2 ** 20)
+        return cls(reader, writer)
+
+    async def request(self, message):
+        message['id'] = self.next_id
+        self.next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[message['id']] = future
+        self.writer.write(json.dumps(message, separators=(',', ':')).encode() + b'\n')
+        return await future
+
+    async def _read(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            event = message['event']
+            if event == 'end':
+                self.ended.add(message['session'])
+            elif event == 'error':
+                self.errors += 1
+            future = self.pending.pop(message.get('id'), None)
+            if future is not None:
+                future.set_result(message)
+        for future in self.pending.values():
+            future.cancel()
+
+    async def close(self):
+        self.writer.close()
+        await self.task
+
+async def play_session(client, mission, rng, think, latencies, deadline):
+    state = await client.request({'op': 'new', 'mission': mission})
+    session, rows, cols = state['session'], state['rows'], state['cols']
+    board = engine.Board(rows, cols, [int(n) for n in state['numbers']],
+                         rule=engine.parse_rule(state['rule']))
+    while session not in client.ended and time.monotonic() < deadline:
+        pair = next(engine.iter_pairs(board), None)
+        if pair is None or rng.random() < MISS_RATE:
+            pair = ((rng.randrange(rows), rng.randrange(cols)),)
+        for row, col in pair:
+            await asyncio.sleep(rng.expovariate(1 / think) if think else 0)
+            start = time.perf_counter()
+            reply = await client.request({'op': 'select', 'session': session,
+                                          'row': row, 'col': col})
+            latencies.append(time.perf_counter() - start)
+            if reply['result'] == engine.VALID_PAIR:
+                board.hide(*pair[0])
+                board.hide(*pair[1])
+            if reply['state'] != engine.PLAYING:
+                break
+        else:
+            if len(pair) == 1:
+                # Missed: drop the stray selection, as a player would with SPACE
+                await client.request({'op': 'clear', 'session': session})
+    finished = session in client.ended
+    client.ended.discard(session)
+    await client.request({'op': 'close', 'session': session})
+    return finished
+
+async def run_slot(client, missions, rng, think, latencies, deadline, counts):
+    # One concurrent player: a new session as soon as the last one ends
+    while time.monotonic() < deadline:
+        if await play_session(client, rng.randint(1, missions), rng, think, latencies, deadline):
+            counts['finished'] += 1
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+
+async def run(args, host, port, unix):
+    probe = await Client.connect(host, port, unix)
+    missions = await probe_missions(probe)
+    await check_malformed(probe)
+    clients = [await Client.connect(host, port, unix)
+               for _ in range(-(-args.sessions // args.per_connection))]
+    rng = random.Random(args.seed)
+    latencies = []
+    counts = {'finished': 0}
+    before = await probe.request({'op': 'stats'})
+    deadline = time.monotonic() + args.duration
+    slots = [run_slot(clients[i // args.per_connection], missions,
+                      random.Random(rng.getrandbits(64)), args.think, latencies, deadline, counts)
+             for i in range(args.sessions)]
+    await asyncio.gather(*slots)
+    after = await probe.request({'op': 'stats'})
+    errors = sum(client.errors for client in clients)
+    for client in clients + [probe]:
+        await client.close()
+
+    wall = after['wall_time'] - before['wall_time']
+    cores = (after['cpu_time'] - before['cpu_time']) / wall
+    moves = after['moves'] - before['moves']
+    print(f"{args.sessions} concurrent sessions for {wall:.1f}s "
+          f"({counts['finished']} played to the end, {errors} errors)")
+    print(f"  {moves:,} moves, {moves / wall:,.0f}/s; server busy {cores:.1%} of a core, "
+          f"peak RSS {after['max_rss_kb'] / 1024:.0f} MB")
+    if cores > 0:
+        print(f"  sessions per core: {args.sessions / cores:,.0f}")
+    print(f"  move latency p50 {percentile(latencies, 50) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 99) * 1000:.2f} ms, "
+          f"max {max(latencies, default=0) * 1000:.2f} ms")
+
+# Requests the server must answer with an error, keeping the connection
+MALFORMED = [
+    {'op': 'select', 'session': [1], 'row': 0, 'col': 0},
+    {'op': 'state', 'session': {'id': 1}},
+    {'op': 'select', 'session': True, 'row': 0, 'col': 0},
+    {'op': 'new', 'seed': [1, 2]},
+    {'op': 'new', 'mission': '1'},
+    {'op': 'new', 'mission': True},
+    {'op': 'bogus'},
+]
+
+async def check_malformed(client):
+    for message in MALFORMED:
+        reply = await client.request(dict(message))
+        if reply['event'] != 'error':
+            raise SystemExit(f"server accepted malformed request {message}: {reply}")
+    # Still connected, and sessions still work
+    reply = await client.request({'op': 'new'})
+    await client.request({'op': 'close', 'session': reply['session']})
+
+async def probe_missions(client):
+    # How many missions the server offers: ask for each until one fails
+    count = 0
+    while True:
+        reply = await client.request({'op': 'new', 'mission': count + 1})
+        if reply['event'] == 'error':
+            return count
+        await client.request({'op': 'close', 'session': reply['session']})
+        count += 1
+
+def start_server(unix):
+    proc = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                          'server.py'), '--unix', unix],
+                            stdout=subprocess.PIPE, text=True)
+    proc.stdout.readline()  # "Serving ..." once it is listening
+    return proc
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test a Space Number Match server")
+    parser.add_argument('--sessions', type=int, default=1000, help="concurrent sessions")
+    parser.add_argument('--duration', type=float, default=20, help="seconds to run")
+    parser.add_argument('--think', type=float, default=THINK_TIME,
+                        help="mean seconds between a session's clicks (0: flat out)")
+    parser.add_argument('--per-connection', type=int, default=SESSIONS_PER_CONNECTION,
+                        help="sessions sharing one connection")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--host', default=server.SERVER_HOST)
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--unix', help="server's Unix socket")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    proc = None
+    unix = args.unix
+    if unix is None and args.port is None:
+        unix = os.path.join(tempfile.mkdtemp(), "server.sock")
+        proc = start_server(unix)
+    try:
+        asyncio.run(run(args, args.host, args.port, unix))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
@@ -0,0 +1,114 @@
+import cProfile
+import csv
+import json
+import os
+import time
+from collections import deque
+
+# Per-phase frame timing for the gameplay loop.
+# Each frame is a sequence of laps: lap(name) charges the time since the
+# previous lap to `name`, so instrumenting a phase costs one perf_counter_ns
+# call and one list update.
+
+PHASES = ('events', 'rules', 'background', 'info', 'grid', 'overlays', 'flip', 'wait')
+PROFILE_DIR = "profiles"
+
+class FrameProfiler:
+    def __init__(self, phases=PHASES, history=600):
+        self.phases = phases
+        self.index = {name: i for i, name in enumerate(phases)}
+        self.frames = deque(maxlen=history)  # per-frame lists of ns per phase
+        self.current = [0] * len(phases)
+        self.last = None
+        self.frame_count = 0
+        self.capture = None
+        self.capture_frames = 0
+        self.capture_path = None
+
+    def begin_frame(self):
+        self.current = [0] * len(self.phases)
+        self.last = time.perf_counter_ns()
+
+    def lap(self, phase):
+        now = time.perf_counter_ns()
+        if self.last is not None:
+            self.current[self.index[phase]] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        self.frames.append(self.current)
+        self.frame_count += 1
+        self.last = None
+        if self.capture is not None:
+            self.capture_frames -= 1
+            if self.capture_frames <= 0:
+                self.stop_capture()
+
+    def summary(self):
+        # {phase: (mean_ms, max_ms)} over the recorded history
+        if not self.frames:
+            return {}
+        result = {}
+        for i, name in enumerate(self.phases):
+            values = [frame[i] for frame in self.frames]
+            result[name] = (sum(values) / len(values) / 1e6, max(values) / 1e6)
+        return result
+
+    def overlay_lines(self):
+        lines = []
+        total = 0.0
+        for name, (mean_ms, max_ms) in self.summary().items():
+            total += mean_ms
+            lines.append(f"{name:<10} {mean_ms:6.2f} ms  max {max_ms:6.2f}")
+        if lines:
+            lines.append(f"{'frame':<10} {total:6.2f} ms  ({len(self.frames)} frames)")
+        if self.capture is not None:
+            lines.append(f"cProfile capture: {self.capture_frames} frames left")
+        return lines
+
+    # Trace export
+    def _trace_path(self, extension, directory):
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        return os.path.join(directory, f"frames-{stamp}.{extension}")
+
+    def export_csv(self, path=None, directory=PROFILE_DIR):
+        path = path or self._trace_path("csv", directory)
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', *(f"{name}_ms" for name in self.phases), 'total_ms'])
+            first = self.frame_count - len(self.frames)
+            for n, frame in enumerate(self.frames):
+                ms = [value / 1e6 for value in frame]
+                writer.writerow([first + n, *(f"{v:.4f}" for v in ms), f"{sum(ms):.4f}"])
+        return path
+
+    def export_json(self, path=None, directory=PROFILE_DIR):
+        path = path or self._trace_path("json", directory)
+        trace = {
+            'phases': list(self.phases),
+            'first_frame': self.frame_count - len(self.frames),
+            'frames_ms': [[round(value / 1e6, 4) for value in frame] for frame in self.frames],
+        }
+        with open(path, 'w') as f:
+            json.dump(trace, f)
+        return path
+
+    # Optional cProfile window over the next `frames` frames
+    def start_capture(self, frames=300, directory=PROFILE_DIR):
+        if self.capture is not None:
+            return
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.capture_path = os.path.join(directory, f"capture-{stamp}.prof")
+        self.capture_frames = frames
+        self.capture = cProfile.Profile()
+        self.capture.enable()
+
+    def stop_capture(self):
+        if self.capture is None:
+            return None
+        self.capture.disable()
+        self.capture.dump_stats(self.capture_path)
+        self.capture = None
+        return self.capture_path
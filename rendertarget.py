@@ -0,0 +1,112 @@
+import math
+import os
+
+import pygame
+
+# Resolution independence. Every screen draws into one render target at the
+# logical resolution the layout is written for, and present() scales what
+# changed into the window once per frame, letterboxed to keep the aspect
+# ratio. The window can be any size, fullscreen or resized at will; only
+# this last step knows about it. Assets are scaled for the logical
+# resolution (and cached on disk per resolution by assetcache), so a new
+# window size never reloads or rescales them.
+#
+# When the window is exactly the logical size the target is the window
+# itself and present() is a plain flip/update: no copy, no scaling.
+#
+# Scale modes pick the filter for that last step only: 'smooth' filters
+# the upscale; 'performance' scales nearest-neighbour, a third to a quarter
+# of the cost, for weak kiosk hardware driving large screens. Drawing
+# always happens at the logical resolution, so neither mode changes fill
+# or blit costs, and at a window of exactly the logical size they are the
+# same.
+
+DISPLAY_MODE = os.environ.get('SPACE_MATCH_DISPLAY_MODE', 'smooth')
+MODES = ('smooth', 'performance')
+LETTERBOX_COLOR = (0, 0, 0)
+MOUSE_EVENTS = (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION)
+
+class RenderTarget:
+    def __init__(self, logical_size, window_size=None, mode=DISPLAY_MODE, fullscreen=False):
+        if mode not in MODES:
+            raise ValueError(f"unknown display mode {mode!r}; expected one of {', '.join(MODES)}")
+        self.logical_size = tuple(logical_size)
+        self.mode = mode
+        self.flags = pygame.FULLSCREEN if fullscreen else pygame.RESIZABLE
+        self.window = None
+        self.target = None
+        # Fullscreen takes the desktop's size
+        self.resize((0, 0) if fullscreen else window_size or self.logical_size)
+
+    @property
+    def direct(self):
+        return self.target is self.window
+
+    def resize(self, window_size):
+        """Follow the window to a new size; returns the (possibly new) target"""
+        # set_mode resizes the window surface in place, so a target that
+        # is the window is copied out first
+        kept = self.target.copy() if self.target is not None else None
+        self.window = pygame.display.set_mode(window_size, self.flags)
+        window_w, window_h = self.window.get_size()
+        logical_w, logical_h = self.logical_size
+        self.scale = min(window_w / logical_w, window_h / logical_h)
+        width, height = round(logical_w * self.scale), round(logical_h * self.scale)
+        self.area = pygame.Rect((window_w - width) // 2, (window_h - height) // 2, width, height)
+
+        if self.window.get_size() == self.logical_size:
+            self.target = self.window
+        else:
+            if self.target is None or self.target is self.window:
+                self.target = pygame.Surface(self.logical_size).convert()
+            self.window.fill(LETTERBOX_COLOR)
+        if kept is not None and kept is not self.target:
+            self.target.blit(kept, (0, 0))
+        return self.target
+
+    # Coordinates
+    def to_logical(self, pos):
+        x, y = pos
+        return (int((x - self.area.x) / self.scale), int((y - self.area.y) / self.scale))
+
+    def to_window(self, rect):
+        # Outward rounding, so neighbouring rects leave no gaps
+        x0 = self.area.x + math.floor(rect.x * self.scale)
+        y0 = self.area.y + math.floor(rect.y * self.scale)
+        x1 = self.area.x + math.ceil(rect.right * self.scale)
+        y1 = self.area.y + math.ceil(rect.bottom * self.scale)
+        return pygame.Rect(x0, y0, x1 - x0, y1 - y0).clip(self.area)
+
+    def map_event(self, event):
+        # Mouse positions arrive in window pixels; the layout wants logical ones
+        if not self.direct and event.type in MOUSE_EVENTS:
+            event.pos = self.to_logical(event.pos)
+        return event
+
+    def mouse_pos(self):
+        pos = pygame.mouse.get_pos()
+        return pos if self.direct else self.to_logical(pos)
+
+    # Output
+    def present(self, rects=None):
+        """Show the whole target, or only `rects` of it (logical coordinates)"""
+        if self.direct:
+            if rects is None:
+                pygame.display.flip()
+            else:
+                pygame.display.update(rects)
+            return
+        bounds = self.target.get_rect()
+        scale = pygame.transform.smoothscale if self.mode == 'smooth' else pygame.transform.scale
+        updated = []
+        for rect in [bounds] if rects is None else rects:
+            rect = pygame.Rect(rect).clip(bounds)
+            dest = self.to_window(rect)
+            if not rect.width or not rect.height or not dest.width or not dest.height:
+                continue
+            scale(self.target.subsurface(rect), dest.size, self.window.subsurface(dest))
+            updated.append(dest)
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(updated)
@@ -0,0 +1,220 @@
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+import zlib
+
+import engine
+
+# Deterministic session replays. A level is fully determined by its board
+# seed and the timestamped inputs applied to engine.Level, so that is all a
+# recording holds: the seed and settings of each level, then its selects and
+# clears with their elapsed times. Checkpoints after every valid pair and at
+# the end store the score and a CRC of the board, so playback (headless,
+# as fast as the engine runs) can verify it reproduces the session exactly.
+#
+# File layout: MAGIC, a version byte, then records. Each record is a type
+# byte followed by a fixed little-endian payload:
+#   LEVEL       seed u64, level u8, rows u16, cols u16, time limit f64,
+#               target pairs u16, points per pair u16, CRC of the numbers u32,
+#               rule kind u8 (index in engine.RULE_KINDS), rule k u8,
+#               end when stuck u8, min decoys u16
+#   SELECT      t f64, row u16, col u16
+#   CLEAR       t f64
+#   CHECKPOINT  t f64, score u32, pairs found u32, visible cells u32, CRC of visibility u32
+#   END         t f64, outcome u8, level time f64
+# Times are seconds since the level started, kept as doubles so the replayed
+# ticks are bit-identical to the recorded ones.
+
+MAGIC = b'SNMR'
+VERSION = 2
+REPLAY_DIR = "replays"
+
+LEVEL, SELECT, CLEAR, CHECKPOINT, END = range(1, 6)
+RECORDS = {
+    LEVEL: struct.Struct('<QBHHdHHIBBBH'),
+    SELECT: struct.Struct('<dHH'),
+    CLEAR: struct.Struct('<d'),
+    CHECKPOINT: struct.Struct('<dIIII'),
+    END: struct.Struct('<dBd'),
+}
+OUTCOMES = (engine.PLAYING, engine.COMPLETE, engine.TIME_UP, engine.NO_MORE_PAIRS)
+
+class ReplayError(Exception):
+    pass
+
+class ReplayMismatch(ReplayError):
+    # Playback diverged from the recording
+    pass
+
+def board_state(state):
+    # What a checkpoint records about a level
+    board = state.board
+    return (state.score, state.pairs_found, board.visible_count(), zlib.crc32(board.visible))
+
+class LevelRecording:
+    def __init__(self, seed, level, rows, cols, time_limit, target_pairs, points_per_pair,
+                 numbers_crc, rule_kind, rule_k, end_when_stuck, min_decoys):
+        self.seed = seed
+        self.level = level
+        self.rows = rows
+        self.cols = cols
+        self.time_limit = time_limit
+        self.target_pairs = target_pairs
+        self.points_per_pair = points_per_pair
+        self.numbers_crc = numbers_crc
+        self.rule_kind = rule_kind
+        self.rule_k = rule_k
+        self.end_when_stuck = end_when_stuck
+        self.min_decoys = min_decoys
+        self.events = []  # (record type, t, *payload)
+
+    @classmethod
+    def for_level(cls, seed, state):
+        board = state.board
+        return cls(seed, state.level, board.rows, board.cols, state.time_limit,
+                   state.target_pairs, state.points_per_pair, zlib.crc32(board.numbers),
+                   engine.RULE_KINDS.index(state.rule.kind), state.rule.k,
+                   int(state.end_when_stuck), state.min_decoys)
+
+    def header(self):
+        return (self.seed, self.level, self.rows, self.cols, self.time_limit,
+                self.target_pairs, self.points_per_pair, self.numbers_crc,
+                self.rule_kind, self.rule_k, self.end_when_stuck, self.min_decoys)
+
+    @property
+    def rule(self):
+        return engine.get_rule(engine.RULE_KINDS[self.rule_kind], self.rule_k)
+
+    # Recording
+    def select(self, t, row, col):
+        self.events.append((SELECT, t, row, col))
+
+    def clear(self, t):
+        self.events.append((CLEAR, t))
+
+    def checkpoint(self, t, state):
+        self.events.append((CHECKPOINT, t, *board_state(state)))
+
+    def end(self, t, state):
+        self.checkpoint(t, state)
+        self.events.append((END, t, OUTCOMES.index(state.state), state.level_time))
+
+class Replay:
+    def __init__(self):
+        self.levels = []
+
+    def start_level(self, seed, state):
+        recording = LevelRecording.for_level(seed, state)
+        self.levels.append(recording)
+        return recording
+
+    def to_bytes(self):
+        out = bytearray(MAGIC)
+        out.append(VERSION)
+        for recording in self.levels:
+            out.append(LEVEL)
+            out += RECORDS[LEVEL].pack(*recording.header())
+            for event in recording.events:
+                out.append(event[0])
+                out += RECORDS[event[0]].pack(*event[1:])
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:len(MAGIC)] != MAGIC:
+            raise ReplayError("not a replay file")
+        if data[len(MAGIC)] != VERSION:
+            raise ReplayError(f"unsupported replay version {data[len(MAGIC)]}")
+        replay = cls()
+        pos = len(MAGIC) + 1
+        while pos < len(data):
+            kind = data[pos]
+            record = RECORDS.get(kind)
+            if record is None or pos + 1 + record.size > len(data):
+                raise ReplayError(f"corrupt record at byte {pos}")
+            fields = record.unpack_from(data, pos + 1)
+            pos += 1 + record.size
+            if kind == LEVEL:
+                replay.levels.append(LevelRecording(*fields))
+            elif not replay.levels:
+                raise ReplayError("event before the first level")
+            else:
+                replay.levels[-1].events.append((kind, *fields))
+        return replay
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, 'wb') as f:
+            f.write(self.to_bytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+def replay_path(directory=REPLAY_DIR):
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(directory, f"session-{stamp}.snmr")
+
+# Playback
+def play_level(recording, verify=True):
+    """Re-run one recorded level headless; returns the final engine.Level"""
+    state = engine.Level(recording.level, recording.rows, recording.cols,
+                         random.Random(recording.seed), time_limit=recording.time_limit,
+                         target_pairs=recording.target_pairs,
+                         points_per_pair=recording.points_per_pair, rule=recording.rule,
+                         end_when_stuck=bool(recording.end_when_stuck),
+                         min_decoys=recording.min_decoys)
+    if verify and zlib.crc32(state.board.numbers) != recording.numbers_crc:
+        raise ReplayMismatch(f"level {recording.level}: board differs from the recording")
+    for event in recording.events:
+        kind, t = event[0], event[1]
+        state.tick(t)
+        if kind == SELECT:
+            state.select(event[2], event[3])
+        elif kind == CLEAR:
+            state.clear_selection()
+        elif kind == CHECKPOINT and verify:
+            actual = board_state(state)
+            if actual != tuple(event[2:]):
+                raise ReplayMismatch(f"level {recording.level} at {t:.3f}s: expected "
+                                     f"(score, pairs, visible, crc) {tuple(event[2:])}, got {actual}")
+        elif kind == END and verify:
+            expected = (OUTCOMES[event[2]], event[3])
+            if (state.state, state.level_time) != expected:
+                raise ReplayMismatch(f"level {recording.level}: expected end {expected}, "
+                                     f"got {(state.state, state.level_time)}")
+    return state
+
+def play(replay, verify=True):
+    return [play_level(recording, verify) for recording in replay.levels]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Verify and benchmark Space Number Match replays")
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--repeat', type=int, default=1, help="play each replay this many times")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    status = 0
+    for path in args.files:
+        replay = Replay.load(path)
+        try:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                levels = play(replay)
+            elapsed = time.perf_counter() - start
+        except ReplayMismatch as e:
+            print(f"{path}: MISMATCH {e}")
+            status = 1
+            continue
+        summary = ", ".join(f"mission {level.level} {level.state} {level.score} pts "
+                            f"{level.level_time:.1f}s" for level in levels)
+        print(f"{path}: ok ({summary}); {args.repeat / elapsed:,.0f} replays/s")
+    sys.exit(status)
@@ -0,0 +1,221 @@
+import argparse
+import atexit
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+# Score history: every finished run, with per-mission score and time, in a
+# local SQLite database. WAL journaling plus one transaction per batch make
+# writes atomic and crash-safe, and let many processes (e.g. sim workers)
+# write at once while readers keep reading. Indexes on score and date keep
+# top-N and per-period queries fast however long the history gets.
+#
+# The game never writes on the render thread: runs go through ScoreWriter,
+# which batches them into transactions on a background thread.
+
+SCORES_DB = os.environ.get('SPACE_MATCH_SCORES_DB', 'scores.db')
+LEGACY_SCORE_FILE = "max_score.txt"
+BUSY_TIMEOUT_MS = 10000  # how long a writer waits for another process's lock
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.5  # seconds a batch may wait for more runs
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    played_at REAL NOT NULL,
+    total_score INTEGER NOT NULL,
+    total_time REAL NOT NULL,
+    grid_size INTEGER,
+    source TEXT NOT NULL DEFAULT 'game'
+);
+CREATE TABLE IF NOT EXISTS missions (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    mission INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    time REAL NOT NULL,
+    PRIMARY KEY (run_id, mission)
+);
+CREATE INDEX IF NOT EXISTS runs_by_score ON runs (total_score DESC, total_time);
+CREATE INDEX IF NOT EXISTS runs_by_date ON runs (played_at);
+"""
+
+# strftime formats for period_summary
+PERIODS = {
+    'day': '%Y-%m-%d',
+    'week': '%Y-W%W',
+    'month': '%Y-%m',
+    'year': '%Y',
+}
+
+def make_run(missions, grid_size=None, source='game', played_at=None):
+    """A run record: missions is a list of (score, seconds), in order"""
+    return {
+        'played_at': time.time() if played_at is None else played_at,
+        'missions': [(int(score), float(seconds)) for score, seconds in missions],
+        'grid_size': grid_size,
+        'source': source,
+    }
+
+class ScoreStore:
+    def __init__(self, path=SCORES_DB):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # Commits stay atomic; a power cut can only lose the latest batches
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def record_runs(self, runs):
+        # All or nothing: one transaction per batch
+        with self.db:
+            for run in runs:
+                missions = run['missions']
+                cursor = self.db.execute(
+                    "INSERT INTO runs (played_at, total_score, total_time, grid_size, source) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (run['played_at'], sum(score for score, _ in missions),
+                     sum(seconds for _, seconds in missions), run['grid_size'], run['source']))
+                self.db.executemany(
+                    "INSERT INTO missions (run_id, mission, score, time) VALUES (?, ?, ?, ?)",
+                    [(cursor.lastrowid, i + 1, score, seconds)
+                     for i, (score, seconds) in enumerate(missions)])
+
+    def record_run(self, run):
+        self.record_runs([run])
+
+    def best_score(self):
+        row = self.db.execute("SELECT MAX(total_score) FROM runs").fetchone()
+        return row[0] or 0
+
+    def top(self, n=10, since=None, until=None, source=None):
+        """Best runs, highest score first and fastest first among ties"""
+        query = "SELECT id, played_at, total_score, total_time, grid_size, source FROM runs"
+        where, params = [], []
+        if since is not None:
+            where.append("played_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("played_at < ?")
+            params.append(until)
+        if source is not None:
+            where.append("source = ?")
+            params.append(source)
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY total_score DESC, total_time LIMIT ?"
+        columns = ('id', 'played_at', 'total_score', 'total_time', 'grid_size', 'source')
+        return [dict(zip(columns, row)) for row in self.db.execute(query, params + [n])]
+
+    def missions(self, run_id):
+        return self.db.execute("SELECT mission, score, time FROM missions "
+                               "WHERE run_id = ? ORDER BY mission", (run_id,)).fetchall()
+
+    def period_summary(self, period='day', since=None):
+        """(period, runs, best score, mean score) per day/week/month/year, newest first"""
+        fmt = PERIODS[period]
+        query = ("SELECT strftime(?, played_at, 'unixepoch', 'localtime') AS p, "
+                 "COUNT(*), MAX(total_score), AVG(total_score) FROM runs")
+        params = [fmt]
+        if since is not None:
+            query += " WHERE played_at >= ?"
+            params.append(since)
+        query += " GROUP BY p ORDER BY p DESC"
+        return self.db.execute(query, params).fetchall()
+
+    def migrate_legacy(self, path=LEGACY_SCORE_FILE):
+        # Import the old single high score once, then move the file aside
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                score = int(f.read())
+        except (OSError, ValueError):
+            score = None
+        if score:
+            self.record_run(make_run([(score, 0.0)], source='legacy',
+                                     played_at=os.path.getmtime(path)))
+        os.replace(path, path + ".migrated")
+        return score
+
+# Background writer: submit() only queues, the thread commits in batches
+class ScoreWriter:
+    def __init__(self, path=SCORES_DB):
+        self.path = path
+        self.queue = queue.Queue()
+        store = ScoreStore(path)
+        store.migrate_legacy()
+        self.best = store.best_score()
+        store.close()
+        self.thread = threading.Thread(target=self._run, name="score-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)  # quitting mid-menu still flushes
+
+    def submit(self, run):
+        total = sum(score for score, _ in run['missions'])
+        self.best = max(self.best, total)
+        self.queue.put(run)
+
+    def flush(self):
+        self.queue.join()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def _run(self):
+        store = ScoreStore(self.path)
+        done = False
+        while not done:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while batch[-1] is not None and len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                done = True
+            runs = [run for run in batch if run is not None]
+            if runs:
+                try:
+                    store.record_runs(runs)
+                except sqlite3.Error as e:
+                    # The game carries on; these runs are lost, so say which
+                    lost = ', '.join(str(sum(score for score, _ in run['missions'])) for run in runs)
+                    print(f"{self.thread.name}: could not save {len(runs)} run(s) "
+                          f"(scores {lost}) to {self.path}: {e}", file=sys.stderr)
+            for _ in batch:
+                self.queue.task_done()
+        store.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Space Number Match score history")
+    parser.add_argument('--db', default=SCORES_DB)
+    parser.add_argument('--top', type=int, default=10, help="how many runs to list")
+    parser.add_argument('--days', type=float, help="only runs from the last N days")
+    parser.add_argument('--source', help="only runs from this source, e.g. game or sim:greedy")
+    parser.add_argument('--period', choices=sorted(PERIODS), help="summarise runs per period")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    store = ScoreStore(args.db)
+    since = time.time() - args.days * 86400 if args.days else None
+    if args.period:
+        for period, runs, best, mean in store.period_summary(args.period, since):
+            print(f"{period:<10} {runs:>8} runs  best {best:>4}  mean {mean:6.1f}")
+    else:
+        for rank, run in enumerate(store.top(args.top, since, source=args.source), 1):
+            played = time.strftime("%Y-%m-%d %H:%M", time.localtime(run['played_at']))
+            missions = "  ".join(f"M{m}: {score} in {seconds:.0f}s"
+                                 for m, score, seconds in store.missions(run['id']))
+            print(f"{rank:>3}. {run['total_score']:>4} pts  {run['total_time']:6.1f}s  "
+                  f"{played}  {run['source']:<12} {missions}")
+    store.close()
@@ -0,0 +1,340 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import resource
+import time
+
+import campaign
+import engine
+
+# Many Number Match sessions in one process, for kiosks and load tests.
+# Each session is an engine.Level, so the rules are exactly those of
+# game.play_level; the server only adds a clock and a socket.
+#
+# Protocol: one JSON object per line, over TCP or a Unix socket. A
+# connection can run any number of sessions side by side. Requests:
+#   {"op": "new", "mission": 1, "seed": 42, "timer": true}   -> state
+#   {"op": "select", "session": 7, "row": 0, "col": 3}        -> select
+#   {"op": "clear", "session": 7}        (the SPACE key)     -> clear
+#   {"op": "state", "session": 7}                            -> state
+#   {"op": "close", "session": 7}                            -> closed
+#   {"op": "stats"}                                          -> stats
+# mission and seed are optional; "timer" asks for a timer event every
+# second. Any "id" in a request is echoed in its reply. The server also
+# pushes, unasked:
+#   {"event": "timer", "session": 7, "time_left": 93}
+#   {"event": "end", "session": 7, "state": "time_up", "score": 35, "level_time": 120.0}
+# Errors come back as {"event": "error", "message": ...}.
+#
+# Clocks: rather than one task or call_later handle per session, every
+# session's next deadline (its next timer event, or running out of time)
+# sits in one timer wheel, advanced by a single task once per tick.
+
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8765
+TICK = 0.25          # wheel resolution in seconds; deadlines fire up to this late
+WHEEL_SLOTS = 1024   # 256 s at TICK; longer deadlines wait for later laps
+LINE_LIMIT = 4096    # longest request line accepted
+
+class TimerWheel:
+    # Hashed timing wheel: slot i holds everything due on a tick that is
+    # i modulo the wheel size. Scheduling and cancelling are O(1); each
+    # tick only looks at one slot.
+    def __init__(self, start, tick=TICK, slots=WHEEL_SLOTS):
+        self.start = start
+        self.tick = tick
+        self.slots = [set() for _ in range(slots)]
+        self.current = 0  # last tick processed
+
+    def __len__(self):
+        return sum(len(slot) for slot in self.slots)
+
+    def tick_at(self, when):
+        return int((when - self.start) / self.tick)
+
+    def schedule(self, item, when):
+        # item needs a `due` attribute; it fires on the first tick at or after `when`
+        self.cancel(item)
+        due = max(self.current + 1, math.ceil((when - self.start) / self.tick))
+        item.due = due
+        self.slots[due % len(self.slots)].add(item)
+
+    def cancel(self, item):
+        if item.due is not None:
+            self.slots[item.due % len(self.slots)].discard(item)
+            item.due = None
+
+    def advance(self, now):
+        """Items due by `now`, in tick order"""
+        target = self.tick_at(now)
+        fired = []
+        while self.current < target:
+            self.current += 1
+            slot = self.slots[self.current % len(self.slots)]
+            due = [item for item in slot if item.due <= self.current]
+            for item in due:
+                slot.remove(item)
+                item.due = None
+            fired += due
+        return fired
+
+class Session:
+    # Kept small: thousands of these live at once
+    __slots__ = ('id', 'level', 'started', 'conn', 'timer', 'due', 'seed')
+
+    def __init__(self, session_id, level, started, conn, timer, seed):
+        self.id = session_id
+        self.level = level
+        self.started = started
+        self.conn = conn
+        self.timer = timer
+        self.due = None
+        self.seed = seed
+
+    def state(self):
+        level = self.level
+        board = level.board
+        return {
+            'event': 'state',
+            'session': self.id,
+            'mission': level.level,
+            'rule': level.rule.name,
+            'goal': level.rule.goal,
+            'rows': board.rows,
+            'cols': board.cols,
+            'numbers': ''.join(map(str, board.numbers)),
+            'visible': ''.join(map(str, board.visible)),
+            'selected': level.selected,
+            'score': level.score,
+            'pairs_found': level.pairs_found,
+            'target_pairs': level.target_pairs,
+            'time_left': level.time_left,
+            'state': level.state,
+            'seed': self.seed,
+        }
+
+class Connection:
+    __slots__ = ('writer', 'sessions')
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.sessions = {}
+
+    def send(self, message):
+        if not self.writer.is_closing():
+            self.writer.write(json.dumps(message, separators=(',', ':')).encode() + b'\n')
+
+class RequestError(Exception):
+    pass
+
+def is_int(value):
+    # JSON true/false arrive as bools, which are ints to isinstance
+    return isinstance(value, int) and not isinstance(value, bool)
+
+class GameServer:
+    def __init__(self, missions=engine.DEFAULT_MISSIONS, tick=TICK):
+        self.missions = list(missions)
+        self.tick = tick
+        self.sessions = {}
+        self.next_id = 1
+        self.wheel = None
+        self.moves = 0
+        self.ended = 0
+        self.started = time.monotonic()
+
+    # Clock
+    def now(self):
+        return asyncio.get_running_loop().time()
+
+    def elapsed(self, session):
+        return self.now() - session.started
+
+    def start_timers(self):
+        loop = asyncio.get_running_loop()
+        self.wheel = TimerWheel(loop.time(), self.tick)
+        return asyncio.create_task(self.run_timers())
+
+    async def run_timers(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            next_tick = self.wheel.start + (self.wheel.current + 1) * self.tick
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            for session in self.wheel.advance(loop.time()):
+                self.on_timer(session)
+
+    def schedule(self, session):
+        # Next deadline: the end of the time limit, or the moment the
+        # whole seconds left (what the game's HUD shows) next go down
+        level = session.level
+        deadline = level.time_limit
+        if session.timer:
+            deadline -= max(0, math.ceil(level.time_limit - self.elapsed(session)) - 1)
+        self.wheel.schedule(session, session.started + deadline)
+
+    def on_timer(self, session):
+        level = session.level
+        level.tick(self.elapsed(session))
+        if level.finished:
+            self.end(session)
+            return
+        if session.timer:
+            session.conn.send({'event': 'timer', 'session': session.id,
+                               'time_left': int(level.time_left)})
+        self.schedule(session)
+
+    # Sessions
+    def new_session(self, conn, request):
+        number = request.get('mission', 1)
+        if not is_int(number) or not 1 <= number <= len(self.missions):
+            raise RequestError(f"no mission {number}; missions are 1-{len(self.missions)}")
+        seed = request.get('seed')
+        if seed is None:
+            seed = random.getrandbits(64)
+        elif not is_int(seed):
+            raise RequestError(f"seed must be an integer, not {seed!r}")
+        level = self.missions[number - 1].make_level(random.Random(seed))
+        session = Session(self.next_id, level, self.now(), conn, bool(request.get('timer')), seed)
+        self.next_id += 1
+        self.sessions[session.id] = session
+        conn.sessions[session.id] = session
+        self.schedule(session)
+        return session
+
+    def end(self, session):
+        # Tell the client the level is over; the session stays readable until closed
+        self.wheel.cancel(session)
+        self.ended += 1
+        level = session.level
+        session.conn.send({'event': 'end', 'session': session.id, 'state': level.state,
+                           'score': level.score, 'level_time': level.level_time})
+
+    def close_session(self, session):
+        self.wheel.cancel(session)
+        self.sessions.pop(session.id, None)
+        session.conn.sessions.pop(session.id, None)
+
+    def lookup(self, conn, request):
+        number = request.get('session')
+        session = conn.sessions.get(number) if is_int(number) else None
+        if session is None:
+            raise RequestError(f"no session {number!r} on this connection")
+        return session
+
+    # Requests
+    def handle(self, conn, request):
+        reply = self.dispatch(conn, request)
+        if 'id' in request:
+            reply['id'] = request['id']
+        conn.send(reply)
+        # A move or a state poll can be what ends the level
+        session = conn.sessions.get(reply.get('session'))
+        if session is not None and session.level.finished and session.due is not None:
+            self.end(session)
+
+    def dispatch(self, conn, request):
+        op = request.get('op')
+        if op == 'new':
+            return self.new_session(conn, request).state()
+        if op == 'stats':
+            return self.stats()
+        session = self.lookup(conn, request)
+        level = session.level
+        if op == 'select':
+            row, col = request.get('row'), request.get('col')
+            if not (is_int(row) and is_int(col)
+                    and 0 <= row < level.board.rows and 0 <= col < level.board.cols):
+                raise RequestError(f"no cell ({row}, {col})")
+            level.tick(self.elapsed(session))
+            result = level.select(row, col)
+            self.moves += 1
+            return {'event': 'select', 'session': session.id, 'result': result,
+                    'score': level.score, 'pairs_found': level.pairs_found,
+                    'state': level.state, 'time_left': level.time_left}
+        if op == 'clear':
+            level.clear_selection()
+            return {'event': 'clear', 'session': session.id}
+        if op == 'state':
+            level.tick(self.elapsed(session))
+            return session.state()
+        if op == 'close':
+            self.close_session(session)
+            return {'event': 'closed', 'session': session.id}
+        raise RequestError(f"unknown op {op!r}")
+
+    def stats(self):
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return {
+            'event': 'stats',
+            'sessions': len(self.sessions),
+            'ended': self.ended,
+            'moves': self.moves,
+            'cpu_time': usage.ru_utime + usage.ru_stime,
+            'wall_time': time.monotonic() - self.started,
+            'max_rss_kb': usage.ru_maxrss,
+        }
+
+    async def handle_client(self, reader, writer):
+        conn = Connection(writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break  # line too long, or the client went away
+                if not line:
+                    break
+                request = None
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise RequestError("requests are JSON objects")
+                    self.handle(conn, request)
+                except (ValueError, TypeError, RequestError) as e:
+                    # A bad request gets an error reply; the connection, and
+                    # every session on it, carries on
+                    error = {'event': 'error', 'message': str(e)}
+                    if isinstance(request, dict) and 'id' in request:
+                        error['id'] = request['id']
+                    conn.send(error)
+                await writer.drain()
+        finally:
+            for session in list(conn.sessions.values()):
+                self.close_session(session)
+            writer.close()
+
+async def serve(server, host=SERVER_HOST, port=SERVER_PORT, unix=None):
+    timers = server.start_timers()
+    if unix:
+        if os.path.exists(unix):
+            os.remove(unix)
+        listener = await asyncio.start_unix_server(server.handle_client, unix, limit=LINE_LIMIT)
+        where = unix
+    else:
+        listener = await asyncio.start_server(server.handle_client, host, port,
+                                              limit=LINE_LIMIT, backlog=1024)
+        where = f"{host}:{listener.sockets[0].getsockname()[1]}"
+    print(f"Serving {len(server.missions)} mission(s) on {where}", flush=True)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        timers.cancel()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Host many Space Number Match sessions")
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--unix', help="listen on this Unix socket instead of TCP")
+    parser.add_argument('--campaign', help="JSON campaign spec (default: the standard missions)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    missions = campaign.load_campaign(args.campaign) if args.campaign else engine.DEFAULT_MISSIONS
+    try:
+        asyncio.run(serve(GameServer(missions), args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,227 @@
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import time
+
+import campaign
+import engine
+import scores
+import solver
+
+# Headless Monte Carlo runner: bots play a full campaign (the main_game
+# flow, by default the standard two missions) on the engine, with
+# simulated click latencies, spread over a process pool. Workers return
+# merged aggregates, not per-game rows, so throughput scales with cores.
+
+CHUNK_GAMES = 500
+DEFAULT_LATENCY = 1.2  # median seconds per click
+DEFAULT_SIGMA = 0.5    # log-normal spread of click latency
+
+# Bots choose the next two cells to click
+class RandomBot:
+    # Clicks two random visible cells, valid or not
+    def choose(self, level, rng):
+        board = level.board
+        cells = rng.sample(range(board.rows * board.cols), min(64, board.rows * board.cols))
+        visible = [i for i in cells if board.visible[i]][:2]
+        if len(visible) < 2:
+            visible = [i for i, v in enumerate(board.visible) if v]
+            if len(visible) < 2:
+                return None
+            visible = rng.sample(visible, 2)
+        return [divmod(i, board.cols) for i in visible]
+
+class GreedyBot:
+    # Takes the first valid pair in scan order
+    def choose(self, level, rng):
+        return next(pair_iterator(level), None)
+
+class OptimalBot:
+    # Takes a pair whose removal keeps the most pairs achievable
+    def choose(self, level, rng):
+        return solver.hint(level.board, budget=float('inf'))
+
+BOTS = {
+    'random': RandomBot,
+    'greedy': GreedyBot,
+    'optimal': OptimalBot,
+}
+
+def pair_iterator(level):
+    return engine.iter_pairs(level.board)
+
+# One mission on simulated time
+def play_level(bot, mission, rng, params):
+    level = mission.make_level(rng)
+    elapsed = 0.0
+    level.tick(elapsed)
+    while not level.finished:
+        clicks = bot.choose(level, rng)
+        if clicks is None:
+            # Nothing left worth clicking: the player waits for the timer
+            level.tick(level.time_limit)
+            break
+        for row, col in clicks:
+            elapsed += rng.lognormvariate(params['latency_mu'], params['latency_sigma'])
+            if level.tick(elapsed) != engine.PLAYING:
+                break
+            level.select(row, col)
+        level.clear_selection()
+    return level
+
+def play_game(bot, rng, params):
+    return tuple(play_level(bot, mission, rng, params) for mission in params['missions'])
+
+# Streaming aggregate statistics, mergeable across workers
+class Stats:
+    def __init__(self, missions=2):
+        self.games = 0
+        self.score_hist = {}
+        self.outcomes = [{} for _ in range(missions)]
+        self.time_sum = [0.0] * missions
+        self.time_sq_sum = [0.0] * missions
+        self.time_hist = [{} for _ in range(missions)]  # whole seconds -> games
+
+    def add(self, levels):
+        self.games += 1
+        total = sum(level.score for level in levels)
+        self.score_hist[total] = self.score_hist.get(total, 0) + 1
+        for i, level in enumerate(levels):
+            self.outcomes[i][level.state] = self.outcomes[i].get(level.state, 0) + 1
+            t = level.level_time
+            self.time_sum[i] += t
+            self.time_sq_sum[i] += t * t
+            bucket = int(t)
+            self.time_hist[i][bucket] = self.time_hist[i].get(bucket, 0) + 1
+
+    def merge(self, other):
+        self.games += other.games
+        for score, n in other.score_hist.items():
+            self.score_hist[score] = self.score_hist.get(score, 0) + n
+        for i in range(len(self.outcomes)):
+            for key, n in other.outcomes[i].items():
+                self.outcomes[i][key] = self.outcomes[i].get(key, 0) + n
+            for key, n in other.time_hist[i].items():
+                self.time_hist[i][key] = self.time_hist[i].get(key, 0) + n
+            self.time_sum[i] += other.time_sum[i]
+            self.time_sq_sum[i] += other.time_sq_sum[i]
+        return self
+
+    def mean_score(self):
+        return sum(score * n for score, n in self.score_hist.items()) / max(1, self.games)
+
+    def percentile(self, hist, q):
+        target = q * self.games
+        seen = 0
+        for key in sorted(hist):
+            seen += hist[key]
+            if seen >= target:
+                return key
+        return None
+
+    def report(self):
+        lines = [f"games: {self.games}"]
+        lines.append(f"total score: mean {self.mean_score():.1f}, "
+                     f"p10 {self.percentile(self.score_hist, 0.1)}, "
+                     f"median {self.percentile(self.score_hist, 0.5)}, "
+                     f"p90 {self.percentile(self.score_hist, 0.9)}")
+        for i in range(len(self.outcomes)):
+            n = max(1, self.games)
+            mean = self.time_sum[i] / n
+            std = math.sqrt(max(0.0, self.time_sq_sum[i] / n - mean * mean))
+            completed = self.outcomes[i].get(engine.COMPLETE, 0) / n
+            outcomes = ", ".join(f"{k} {v / n:.1%}" for k, v in sorted(self.outcomes[i].items()))
+            lines.append(f"mission {i + 1}: completed {completed:.1%}; "
+                         f"time mean {mean:.1f}s sd {std:.1f}s "
+                         f"median {self.percentile(self.time_hist[i], 0.5)}s ({outcomes})")
+        return "\n".join(lines)
+
+def run_chunk(task):
+    # Worker entry point: (bot name, seed, games, params, scores db) -> Stats.
+    # With a scores db, every game is recorded there, one transaction per chunk.
+    bot_name, seed, games, params, scores_db = task
+    bot = BOTS[bot_name]()
+    rng = random.Random(seed)
+    stats = Stats(len(params['missions']))
+    runs = []
+    for _ in range(games):
+        levels = play_game(bot, rng, params)
+        stats.add(levels)
+        if scores_db:
+            runs.append(scores.make_run([(level.score, level.level_time) for level in levels],
+                                        levels[0].board.rows, source=f"sim:{bot_name}"))
+    if runs:
+        store = scores.ScoreStore(scores_db)
+        store.record_runs(runs)
+        store.close()
+    return stats
+
+def make_params(grid_size=None, time_limit=None, target_pairs=None, points_per_pair=None,
+                latency=DEFAULT_LATENCY, sigma=DEFAULT_SIGMA, missions=engine.DEFAULT_MISSIONS):
+    # Any setting given overrides it for every mission
+    missions = [engine.Mission(m.number, m.rule,
+                               rows=grid_size or m.rows, cols=grid_size or m.cols,
+                               time_limit=time_limit or m.time_limit,
+                               target_pairs=target_pairs or m.target_pairs,
+                               points_per_pair=points_per_pair or m.points_per_pair,
+                               end_when_stuck=m.end_when_stuck, min_decoys=m.min_decoys)
+                for m in missions]
+    return {
+        'missions': missions,
+        'latency_mu': math.log(latency),
+        'latency_sigma': sigma,
+    }
+
+def simulate(games, bot='greedy', workers=None, seed=0, params=None, chunk=CHUNK_GAMES,
+             scores_db=None):
+    params = params or make_params()
+    workers = workers or os.cpu_count() or 1
+    # Per-chunk seeds from one master seed: reproducible for any worker count
+    seeds = random.Random(seed)
+    tasks = []
+    remaining = games
+    while remaining > 0:
+        n = min(chunk, remaining)
+        tasks.append((bot, seeds.getrandbits(64), n, params, scores_db))
+        remaining -= n
+
+    stats = Stats(len(params['missions']))
+    if workers == 1:
+        for task in tasks:
+            stats.merge(run_chunk(task))
+        return stats
+    with multiprocessing.Pool(workers) as pool:
+        for part in pool.imap_unordered(run_chunk, tasks):
+            stats.merge(part)
+    return stats
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Headless Space Number Match simulations")
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--bot', choices=sorted(BOTS), default='greedy')
+    parser.add_argument('--workers', type=int, default=None, help="default: all cores")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--campaign', help="mission spec file (default: the standard two missions)")
+    parser.add_argument('--grid-size', type=int, help="default: per mission")
+    parser.add_argument('--time-per-level', type=float, help="default: per mission")
+    parser.add_argument('--pairs-per-level', type=int, help="default: per mission")
+    parser.add_argument('--points-per-pair', type=int, help="default: per mission")
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY,
+                        help="median seconds per click")
+    parser.add_argument('--sigma', type=float, default=DEFAULT_SIGMA,
+                        help="log-normal spread of click latency")
+    parser.add_argument('--scores', metavar='DB', help="record every game in this score database")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    missions = campaign.load_campaign(args.campaign) if args.campaign else engine.DEFAULT_MISSIONS
+    params = make_params(args.grid_size, args.time_per_level, args.pairs_per_level,
+                         args.points_per_pair, args.latency, args.sigma, missions)
+    start = time.perf_counter()
+    stats = simulate(args.games, args.bot, args.workers, args.seed, params, scores_db=args.scores)
+    elapsed = time.perf_counter() - start
+    print(stats.report())
+    print(f"{args.games / elapsed:,.0f} games/s on {args.workers or os.cpu_count()} workers")
@@ -0,0 +1,197 @@
+import math
+import os
+import random
+import struct
+import zlib
+
+import engine
+
+# Suspend/resume: a snapshot of the mission in progress, written when the
+# window is closed mid-level and offered on the start screen next launch.
+#
+# File layout: MAGIC, a version byte, then fixed little-endian fields:
+#   LEVEL   board seed u64, mission number u8, rows u16, cols u16,
+#           time limit f64, target pairs u16, points per pair u16,
+#           rule kind u8 (index in engine.RULE_KINDS), rule k u8,
+#           end when stuck u8, min decoys u16          (as in a replay)
+#   STATE   score u32, pairs found u32, time left f64, selected cells u8,
+#           then row u16, col u16 per selected cell
+#   RUN     mission index in the campaign u16, grid size u16 (0: the
+#           missions' own), missions done u16, then score u32, time f64 each
+#   RNG     random module state: 625 u32 words, gauss_next f64 (NaN: none)
+#   BOARD   numbers as nibbles, two cells per byte, the even cell high;
+#           then visibility, one bit per cell, cell i in bit i % 8 of byte i // 8
+#   CRC32 of everything before it, u32
+# Packing and unpacking go through big integers and strided slices rather
+# than a loop over cells, so a 1000x1000 board takes milliseconds.
+
+MAGIC = b'SNMS'
+VERSION = 1
+SNAPSHOT_FILE = "snapshot.snms"
+
+LEVEL = struct.Struct('<QBHHdHHBBBH')
+STATE = struct.Struct('<IIdB')
+CELL = struct.Struct('<HH')
+RUN = struct.Struct('<HHH')
+RESULT = struct.Struct('<Id')
+RNG = struct.Struct('<625Id')
+CRC = struct.Struct('<I')
+
+class SnapshotError(Exception):
+    pass
+
+# Board packing
+def pack_nibbles(numbers):
+    # Every number is below 16, so shifting the whole big integer by 4
+    # moves each byte into its own high nibble
+    padded = bytes(numbers) + bytes(len(numbers) % 2)
+    high = int.from_bytes(padded[0::2], 'big') << 4
+    low = int.from_bytes(padded[1::2], 'big')
+    return (high | low).to_bytes(len(padded) // 2, 'big')
+
+def unpack_nibbles(data, cells):
+    size = len(data)
+    packed = int.from_bytes(data, 'big')
+    low_mask = int.from_bytes(b'\x0f' * size, 'big')
+    numbers = bytearray(2 * size)
+    numbers[0::2] = ((packed >> 4) & low_mask).to_bytes(size, 'big')
+    numbers[1::2] = (packed & low_mask).to_bytes(size, 'big')
+    del numbers[cells:]
+    return numbers
+
+def pack_bits(flags):
+    # flags[k::8] as a little-endian integer has cell 8j+k at bit 8j;
+    # shifted by k, the eight strides interleave into one bitset
+    size = (len(flags) + 7) // 8
+    padded = bytes(flags) + bytes(8 * size - len(flags))
+    bits = 0
+    for k in range(8):
+        bits |= int.from_bytes(padded[k::8], 'little') << k
+    return bits.to_bytes(size, 'little')
+
+def unpack_bits(data, cells):
+    size = len(data)
+    bits = int.from_bytes(data, 'little')
+    ones = int.from_bytes(b'\x01' * size, 'little')
+    flags = bytearray(8 * size)
+    for k in range(8):
+        flags[k::8] = ((bits >> k) & ones).to_bytes(size, 'little')
+    del flags[cells:]
+    return flags
+
+class Snapshot:
+    def __init__(self, seed, state, mission_index=0, grid_size=None, results=(),
+                 rng_state=None):
+        self.seed = seed              # the level's board seed
+        self.state = state            # the engine.Level in progress
+        self.mission_index = mission_index
+        self.grid_size = grid_size
+        self.results = list(results)  # (score, seconds) of the missions already done
+        self.rng_state = rng_state if rng_state is not None else random.getstate()
+
+    def to_bytes(self):
+        state = self.state
+        board = state.board
+        out = bytearray(MAGIC)
+        out.append(VERSION)
+        out += LEVEL.pack(self.seed, state.level, board.rows, board.cols, state.time_limit,
+                          state.target_pairs, state.points_per_pair,
+                          engine.RULE_KINDS.index(state.rule.kind), state.rule.k,
+                          int(state.end_when_stuck), state.min_decoys)
+        out += STATE.pack(state.score, state.pairs_found, state.time_left, len(state.selected))
+        for row, col in state.selected:
+            out += CELL.pack(row, col)
+        out += RUN.pack(self.mission_index, self.grid_size or 0, len(self.results))
+        for score, seconds in self.results:
+            out += RESULT.pack(score, seconds)
+        _, words, gauss_next = self.rng_state
+        out += RNG.pack(*words, math.nan if gauss_next is None else gauss_next)
+        out += pack_nibbles(board.numbers)
+        out += pack_bits(board.visible)
+        out += CRC.pack(zlib.crc32(out))
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:len(MAGIC)] != MAGIC:
+            raise SnapshotError("not a snapshot file")
+        if len(data) <= len(MAGIC) or data[len(MAGIC)] != VERSION:
+            raise SnapshotError("unsupported snapshot version")
+        if len(data) < len(MAGIC) + 1 + CRC.size or \
+                zlib.crc32(data[:-CRC.size]) != CRC.unpack_from(data, len(data) - CRC.size)[0]:
+            raise SnapshotError("snapshot is corrupt")
+        try:
+            return cls._parse(data, len(MAGIC) + 1)
+        except (struct.error, ValueError, IndexError) as e:
+            raise SnapshotError(f"snapshot is corrupt: {e}")
+
+    @classmethod
+    def _parse(cls, data, pos):
+        (seed, level, rows, cols, time_limit, target_pairs, points_per_pair,
+         rule_kind, rule_k, end_when_stuck, min_decoys) = LEVEL.unpack_from(data, pos)
+        pos += LEVEL.size
+        score, pairs_found, time_left, selected = STATE.unpack_from(data, pos)
+        pos += STATE.size
+        cells = []
+        for _ in range(selected):
+            cells.append(CELL.unpack_from(data, pos))
+            pos += CELL.size
+        mission_index, grid_size, done = RUN.unpack_from(data, pos)
+        pos += RUN.size
+        results = []
+        for _ in range(done):
+            results.append(RESULT.unpack_from(data, pos))
+            pos += RESULT.size
+        *words, gauss_next = RNG.unpack_from(data, pos)
+        pos += RNG.size
+        rng_state = (3, tuple(words), None if math.isnan(gauss_next) else gauss_next)
+
+        count = rows * cols
+        numbers = unpack_nibbles(data[pos:pos + (count + 1) // 2], count)
+        pos += (count + 1) // 2
+        visible = unpack_bits(data[pos:pos + (count + 7) // 8], count)
+        pos += (count + 7) // 8
+        if pos != len(data) - CRC.size:
+            raise SnapshotError("snapshot has the wrong length")
+
+        # Straight back to the live board: no generation, no per-cell work
+        rule = engine.get_rule(engine.RULE_KINDS[rule_kind], rule_k)
+        board = engine.Board(rows, cols, numbers, rule, visible)
+        state = engine.Level(level, rows, cols, board=board, time_limit=time_limit,
+                             target_pairs=target_pairs, points_per_pair=points_per_pair,
+                             rule=rule, end_when_stuck=bool(end_when_stuck),
+                             min_decoys=min_decoys)
+        state.restore(score, pairs_found, time_left, cells)
+        return cls(seed, state, mission_index, grid_size or None, results, rng_state)
+
+    def save(self, path=SNAPSHOT_FILE):
+        # Write-then-rename, so quitting mid-write never leaves half a snapshot
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, 'wb') as f:
+            f.write(self.to_bytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=SNAPSHOT_FILE):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+def load_suspended(missions, path=SNAPSHOT_FILE):
+    """The saved snapshot if there is one and it belongs to this campaign, else None"""
+    try:
+        saved = Snapshot.load(path)
+    except (OSError, SnapshotError):
+        return None
+    if saved.mission_index >= len(missions):
+        return None
+    mission = missions[saved.mission_index]
+    if (mission.number, mission.rule) != (saved.state.level, saved.state.rule):
+        return None
+    return saved
+
+def discard(path=SNAPSHOT_FILE):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
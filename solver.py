@@ -0,0 +1,105 @@
+import time
+from functools import lru_cache
+
+import engine
+
+# Exact optimal-play solver: the most pairs still removable from a board
+# state under a rule, and a hint for the best next pair.
+#
+# Only the multiset of visible numbers matters, so states are keyed on the
+# per-number count tuple. Forced moves are applied first (an isolated
+# number pairs with itself, a number with a single possible partner pairs
+# with it as often as it can); only what is left is searched, memoized.
+
+HINT_BUDGET = 0.002  # seconds of candidate scoring per hint call, well inside a 60 FPS frame
+
+@lru_cache(maxsize=None)
+def _partners(pairs):
+    # number -> numbers it can pair with (itself included if allowed)
+    partners = {n: [] for n in range(1, 10)}
+    for a, b in pairs:
+        partners[a].append(b)
+        if a != b:
+            partners[b].append(a)
+    return partners
+
+def _reduce(counts, pairs):
+    # Apply moves that never lose optimality; returns (pairs made, counts)
+    counts = list(counts)
+    made = 0
+    changed = True
+    while changed:
+        changed = False
+        for a, candidates in _partners(pairs).items():
+            if not counts[a]:
+                continue
+            live = [b for b in candidates if counts[b] and (b != a or counts[a] > 1)]
+            if live == [a]:
+                # Only pairs with itself
+                made += counts[a] // 2
+                counts[a] %= 2
+                changed = True
+            elif len(live) == 1 and a not in candidates:
+                # A leaf: pairing it with its only partner is always safe
+                b = live[0]
+                k = min(counts[a], counts[b])
+                counts[a] -= k
+                counts[b] -= k
+                made += k
+                changed = True
+    return made, tuple(counts)
+
+@lru_cache(maxsize=65536)
+def _solve(counts, pairs):
+    made, counts = _reduce(counts, pairs)
+    best = 0
+    for a, b in pairs:
+        if counts[a] and counts[b] and (a != b or counts[a] > 1):
+            after = list(counts)
+            after[a] -= 1
+            after[b] -= 1
+            best = max(best, 1 + _solve(tuple(after), pairs))
+    return made + best
+
+def max_remaining_pairs(counts, rule):
+    """Most pairs still removable from per-number counts under an engine.Rule"""
+    return _solve(tuple(counts), rule.pairs)
+
+def board_max_pairs(board):
+    return max_remaining_pairs(board.counts, board.rule)
+
+def hint(board, rule=None, budget=HINT_BUDGET):
+    """Best next pair as [(r1, c1), (r2, c2)], or None if no pair is left.
+
+    Candidates are scored with the solver until the budget runs out; after
+    that the best pair found so far (or any valid pair) is returned. The
+    budget covers the scoring; locating the chosen pair's cells afterwards
+    is a memchr over the board (engine.find_value_pair), about 0.3 ms at
+    worst on a 1000x1000 board, so a call stays well inside a frame.
+    """
+    deadline = time.perf_counter() + budget
+    pairs = (rule or board.rule).pairs
+    counts = tuple(board.counts)
+    best = None
+    best_score = -1
+    target = None
+    for a, b in pairs:
+        if not counts[a] or not counts[b] or (a == b and counts[a] < 2):
+            continue
+        if best is None:
+            best = (a, b)  # fallback if we run out of time
+        if time.perf_counter() > deadline:
+            break
+        if target is None:
+            target = _solve(counts, pairs) - 1
+        after = list(counts)
+        after[a] -= 1
+        after[b] -= 1
+        score = _solve(tuple(after), pairs)
+        if score > best_score:
+            best, best_score = (a, b), score
+        if score >= target:
+            break  # an optimal move: nothing can do better
+    if best is None:
+        return None
+    return engine.find_value_pair(board, *best)
@@ -0,0 +1,56 @@
+from collections import OrderedDict
+
+# Shared cache of rendered text. Most strings on screen change rarely (the
+# timer once a second, the score once per pair), so each distinct
+# (font, text, colour, antialias) is rasterized once and then reused.
+# Eviction is least-recently-used, which bounds memory however many
+# different scores and timer values a session goes through.
+#
+# Returned surfaces are shared: blit them, never draw on them. Anything
+# that changes one (e.g. set_alpha) must put it back afterwards.
+
+TEXT_CACHE_SIZE = 256
+
+class TextCache:
+    def __init__(self, maxsize=TEXT_CACHE_SIZE):
+        self.maxsize = maxsize  # 0 disables caching
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font, text, antialias, color):
+        key = (font, text, tuple(color), antialias)
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = font.render(text, antialias, color)
+        if self.maxsize > 0:
+            self.surfaces[key] = surf
+            if len(self.surfaces) > self.maxsize:
+                self.surfaces.popitem(last=False)
+                self.evictions += 1
+        return surf
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def clear(self):
+        self.surfaces.clear()
+
+    def __len__(self):
+        return len(self.surfaces)
+
+    def stats_line(self):
+        return (f"text cache {len(self)}/{self.maxsize}: {self.hits} hits, "
+                f"{self.misses} misses ({self.hit_rate():.1%}), {self.evictions} evicted")
+
+text_cache = TextCache()
+
+def render_text(font, text, antialias, color):
+    # Drop-in for font.render(text, antialias, color)
+    return text_cache.render(font, text, antialias, color)
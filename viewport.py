@@ -0,0 +1,109 @@
+# Scrollable, zoomable window onto the board.
+# Pixel <-> cell mapping is plain arithmetic, so hit-testing is O(1) and
+# drawing only ever touches the cells inside the window, whatever the
+# board size. Rects are (x, y, width, height) tuples in screen pixels.
+
+MIN_CELL_SIZE = 16
+MAX_CELL_SIZE = 120
+ZOOM_STEP = 1.25
+
+class Viewport:
+    def __init__(self, rows, cols, cell_size, max_area):
+        # max_area: the screen region the grid may use, (x, y, width, height)
+        self.rows = rows
+        self.cols = cols
+        self.max_area = max_area
+        self.offset_x = 0  # board pixels scrolled off the left/top edge
+        self.offset_y = 0
+        self.set_cell_size(cell_size)
+
+    def set_cell_size(self, cell_size):
+        self.cell_size = max(MIN_CELL_SIZE, min(MAX_CELL_SIZE, int(cell_size)))
+        # The window shrinks to the board when the whole board fits,
+        # centred horizontally and anchored to the top of the area
+        max_x, max_y, max_w, max_h = self.max_area
+        width = min(max_w, self.cols * self.cell_size)
+        height = min(max_h, self.rows * self.cell_size)
+        self.area = (max_x + (max_w - width) // 2, max_y, width, height)
+        self.clamp()
+
+    @property
+    def scrollable(self):
+        _, _, width, height = self.area
+        return width < self.cols * self.cell_size or height < self.rows * self.cell_size
+
+    def clamp(self):
+        _, _, width, height = self.area
+        self.offset_x = max(0, min(self.offset_x, self.cols * self.cell_size - width))
+        self.offset_y = max(0, min(self.offset_y, self.rows * self.cell_size - height))
+
+    def scroll(self, dx, dy):
+        before = (self.offset_x, self.offset_y)
+        self.offset_x += dx
+        self.offset_y += dy
+        self.clamp()
+        return (self.offset_x, self.offset_y) != before
+
+    def center_on(self, row, col):
+        before = (self.offset_x, self.offset_y)
+        _, _, width, height = self.area
+        self.offset_x = col * self.cell_size + self.cell_size // 2 - width // 2
+        self.offset_y = row * self.cell_size + self.cell_size // 2 - height // 2
+        self.clamp()
+        return (self.offset_x, self.offset_y) != before
+
+    def zoom(self, factor, anchor=None):
+        # Zoom keeping the board point under `anchor` (screen pixel) in place
+        x, y, width, height = self.area
+        if anchor is None:
+            anchor = (x + width // 2, y + height // 2)
+        old_size = self.cell_size
+        board_x = (anchor[0] - x + self.offset_x) / old_size
+        board_y = (anchor[1] - y + self.offset_y) / old_size
+        self.set_cell_size(round(old_size * factor))
+        if self.cell_size == old_size:
+            return False
+        x, y, _, _ = self.area
+        self.offset_x = int(board_x * self.cell_size - (anchor[0] - x))
+        self.offset_y = int(board_y * self.cell_size - (anchor[1] - y))
+        self.clamp()
+        return True
+
+    def contains(self, pos):
+        x, y, width, height = self.area
+        return x <= pos[0] < x + width and y <= pos[1] < y + height
+
+    def cell_at(self, pos):
+        # (row, col) under a screen pixel, or None
+        if not self.contains(pos):
+            return None
+        x, y, _, _ = self.area
+        col = (pos[0] - x + self.offset_x) // self.cell_size
+        row = (pos[1] - y + self.offset_y) // self.cell_size
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return row, col
+        return None
+
+    def cell_rect(self, row, col):
+        x, y, _, _ = self.area
+        return (x + col * self.cell_size - self.offset_x,
+                y + row * self.cell_size - self.offset_y,
+                self.cell_size, self.cell_size)
+
+    def cells_in(self, rect):
+        # Rows and columns (as ranges) of the cells overlapping a screen rect
+        ax, ay, aw, ah = self.area
+        rx, ry, rw, rh = rect
+        left, top = max(ax, rx), max(ay, ry)
+        right, bottom = min(ax + aw, rx + rw), min(ay + ah, ry + rh)
+        if right <= left or bottom <= top:
+            return range(0), range(0)
+        size = self.cell_size
+        first_col = (left - ax + self.offset_x) // size
+        last_col = min(self.cols - 1, (right - 1 - ax + self.offset_x) // size)
+        first_row = (top - ay + self.offset_y) // size
+        last_row = min(self.rows - 1, (bottom - 1 - ay + self.offset_y) // size)
+        return range(first_row, last_row + 1), range(first_col, last_col + 1)
+
+    def visible_cells(self):
+        return self.cells_in(self.area)